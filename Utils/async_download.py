@@ -0,0 +1,486 @@
+"""
+libs/Utils/async_download.py
+
+asyncio download engine (one event loop, bounded concurrency) for batches of small files like libraries, natives and
+assets. Transfers run on the event loop itself (HTTP/1.1 over asyncio streams with per-host keep-alive connections),
+so hundreds of files can be in flight without a thread per file. Every transfer has the same file store, mirror,
+offline mode and circuit breaker behaviour as download_file, and the file is verified while it is downloading.
+Retries wait on the event loop instead of holding a connection.
+Files are downloaded in one request (they aren't resumed or segmented). If a proxy is configured (HTTP(S)_PROXY...),
+the batch is downloaded by multi_thread_download instead.
+"""
+import asyncio
+import os
+import ssl
+import time
+import urllib.parse
+import urllib.request
+import certifi
+import requests
+from tqdm import tqdm
+from LauncherBase import Base
+from libs.Utils import network, retry, mirror, blob_store, scheduler, telemetry
+from libs.Utils.crypto import get_hash_object
+from libs.Utils.utils import multi_thread_download, _get_priority_function, _remove_part_file
+
+default_max_concurrency = 256  # Max in-flight transfers of a batch (also limited by scheduler.download_budget)
+max_redirects = 5
+redirect_status_codes = (301, 302, 303, 307, 308)
+
+
+class _TransferError(Exception):
+    """
+    The connection or the response failed (reason: the original error type, like the reasons of download_file)
+    """
+
+    def __init__(self, error):
+        super().__init__(str(error) or type(error).__name__)
+        self.reason = type(error).__name__
+
+
+class _HTTPStatusError(Exception):
+    def __init__(self, url, status_code, retry_after):
+        super().__init__(f"{status_code} Error for url: {url}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _ConnectionPool:
+    """
+    Keep-alive connections of one event loop ({(scheme, host, port): [(reader, writer)]})
+    """
+
+    def __init__(self):
+        self._idle = {}
+        self._ssl_context = None
+
+    def _get_ssl_context(self):
+        # Same CA bundle as requests
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context(cafile=certifi.where())
+        return self._ssl_context
+
+    async def open(self, key):
+        """
+        :return: reader, writer, reused (the connection was used before)
+        """
+        idle_list = self._idle.get(key, [])
+        while len(idle_list) > 0:
+            reader, writer = idle_list.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+
+        scheme, host, port = key
+        ssl_context = self._get_ssl_context() if scheme == "https" else None
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=ssl_context),
+                                                network.default_timeout)
+        return reader, writer, False
+
+    def release(self, key, reader, writer, reusable):
+        if reusable and not writer.is_closing():
+            self._idle.setdefault(key, []).append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for idle_list in self._idle.values():
+            for _, writer in idle_list:
+                writer.close()
+        self._idle.clear()
+
+
+class _Response:
+    def __init__(self, url, key, reader, writer, status_code, headers, keep_alive):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers  # {lower case name: value}
+        self._key = key
+        self._reader = reader
+        self._writer = writer
+        self._keep_alive = keep_alive
+        self._completed = False
+
+    async def _read(self, size):
+        return await asyncio.wait_for(self._reader.read(size), network.default_timeout)
+
+    async def _readline(self):
+        return await asyncio.wait_for(self._reader.readline(), network.default_timeout)
+
+    async def iter_content(self, chunk_size):
+        """
+        Read the body (chunked, Content-Length or until the connection is closed)
+        Raise _TransferError if the connection fails or the body is incomplete.
+        """
+        try:
+            if self.status_code in (204, 304):
+                pass
+            elif "chunked" in self.headers.get("transfer-encoding", "").lower():
+                while True:
+                    size_line = await self._readline()
+                    if not size_line:
+                        raise asyncio.IncompleteReadError(b"", None)
+                    size = int(size_line.split(b";", 1)[0].strip(), 16)
+                    if size == 0:
+                        # Trailers
+                        while (await self._readline()) not in (b"\r\n", b"\n", b""):
+                            pass
+                        break
+
+                    while size > 0:
+                        chunk = await self._read(min(size, chunk_size))
+                        if not chunk:
+                            raise asyncio.IncompleteReadError(b"", size)
+                        size -= len(chunk)
+                        yield chunk
+                    await self._readline()
+            elif "content-length" in self.headers:
+                remaining = int(self.headers["content-length"])
+                while remaining > 0:
+                    chunk = await self._read(min(remaining, chunk_size))
+                    if not chunk:
+                        raise asyncio.IncompleteReadError(b"", remaining)
+                    remaining -= len(chunk)
+                    yield chunk
+            else:
+                # The body ends when the server closes the connection
+                self._keep_alive = False
+                while True:
+                    chunk = await self._read(chunk_size)
+                    if not chunk:
+                        break
+                    yield chunk
+        except (OSError, asyncio.TimeoutError, EOFError, ValueError) as e:
+            raise _TransferError(e) from e
+
+        self._completed = True
+
+    def release(self, pool):
+        """
+        Give the connection back to the pool (connections with an unfinished body are closed)
+        """
+        pool.release(self._key, self._reader, self._writer, self._keep_alive and self._completed)
+
+
+async def _send_request(pool, url):
+    """
+    Send a GET request (a reused connection which the server already closed is retried on a new connection)
+    :return: _Response
+    """
+    parsed_url = urllib.parse.urlsplit(url)
+    scheme = parsed_url.scheme.lower()
+    if scheme not in ("http", "https") or not parsed_url.hostname:
+        raise _TransferError(ValueError(f"Unsupported URL {url}"))
+
+    key = (scheme, parsed_url.hostname, parsed_url.port or (443 if scheme == "https" else 80))
+    path = parsed_url.path or "/"
+    if parsed_url.query:
+        path += f"?{parsed_url.query}"
+    request_data = (f"GET {path} HTTP/1.1\r\n"
+                    f"Host: {parsed_url.netloc.rsplit('@', 1)[-1]}\r\n"
+                    f"User-Agent: {requests.utils.default_user_agent()}\r\n"
+                    f"Accept-Encoding: identity\r\n"
+                    f"Connection: keep-alive\r\n\r\n").encode("utf-8")
+
+    while True:
+        reused = False
+        writer = None
+        try:
+            reader, writer, reused = await pool.open(key)
+            writer.write(request_data)
+            await asyncio.wait_for(writer.drain(), network.default_timeout)
+
+            status_line = await asyncio.wait_for(reader.readline(), network.default_timeout)
+            if not status_line:
+                raise ConnectionResetError(f"Connection closed by {parsed_url.hostname}")
+            version, status_code = status_line.decode("latin-1").split(" ", 2)[:2]
+
+            headers = {}
+            while True:
+                header_line = await asyncio.wait_for(reader.readline(), network.default_timeout)
+                if header_line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header_line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except ConnectionError as e:
+            if writer is not None:
+                writer.close()
+            if reused:
+                # Idle connection which the server closed, try again on a new connection
+                continue
+            raise _TransferError(e) from e
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            if writer is not None:
+                writer.close()
+            raise _TransferError(e) from e
+
+        keep_alive = version.upper() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        return _Response(url, key, reader, writer, int(status_code), headers, keep_alive)
+
+
+async def _get(pool, url):
+    """
+    Send a GET request and follow redirects
+    :return: _Response
+    """
+    for _ in range(max_redirects + 1):
+        response = await _send_request(pool, url)
+        if response.status_code not in redirect_status_codes or "location" not in response.headers:
+            return response
+
+        # Read the (short) body of the redirect, so the connection can be reused
+        async for _ in response.iter_content(65536):
+            pass
+        response.release(pool)
+        url = urllib.parse.urljoin(url, response.headers["location"])
+
+    raise _TransferError(requests.exceptions.TooManyRedirects(f"Exceeded {max_redirects} redirects."))
+
+
+async def _download_file_async(pool, url, dest_path, sha1, chunk_size, failure_info, transfer_info, **kwargs):
+    """
+    download_file on the event loop
+    :param use_mirror: Use registered mirrors (default: True)
+    :param use_blob_store: Link the file from the file store and add it after it is downloaded (default: True)
+    :return: Status
+    """
+    use_mirror = kwargs.get("use_mirror", True)
+    use_blob_store = kwargs.get("use_blob_store", True)
+    loop = asyncio.get_running_loop()
+    part_path = f"{dest_path}.part"
+
+    # The stored file is verified before it is linked (file reads don't block the event loop)
+    if use_blob_store and sha1 is not None and blob_store.blob_store_enabled:
+        if await loop.run_in_executor(None, blob_store.link_from_blob_store, sha1, dest_path):
+            _remove_part_file(part_path)
+            transfer_info["from_store"] = True
+            return True
+
+    if use_mirror:
+        # The first call probes the mirrors
+        mirror_url = await loop.run_in_executor(None, mirror.rewrite_url, url)
+        if mirror_url != url:
+            mirror_failure_info = {}
+            if await _download_file_async(pool, mirror_url, dest_path, sha1, chunk_size, mirror_failure_info,
+                                          transfer_info, use_mirror=False, use_blob_store=False):
+                if use_blob_store:
+                    await loop.run_in_executor(None, blob_store.add_to_blob_store, dest_path, sha1)
+                return True
+
+            if mirror_failure_info.get("reason", None) == network.offline_mode_error:
+                failure_info.update(mirror_failure_info)
+                return False
+            # A mirror which doesn't have the file (404...) is only skipped for this file
+            mirror_status_code = mirror_failure_info.get("status_code", None)
+            if mirror_status_code is None or mirror_status_code >= 500:
+                mirror.report_mirror_failure(mirror_url, mirror_failure_info.get("reason", None) or "Failed")
+
+    if not network.check_network_allowed(url, no_output=True):
+        failure_info["reason"] = network.offline_mode_error
+        return False
+
+    circuit_breaker = retry.get_circuit_breaker()
+    host = retry.get_host(url)
+    if not circuit_breaker.allow_request(host):
+        failure_info["reason"] = retry.circuit_open_error
+        return False
+
+    hash_obj = get_hash_object("sha1") if sha1 is not None else None
+    downloaded_bytes = 0
+    transfer_info["final_url"] = url
+    transfer_info["ttfb"] = None
+    request_start_time = time.monotonic()
+    # Same as download_file, the outcome of the host is recorded on every path (None = nothing to record)
+    host_result = None
+    try:
+        dest_dir = os.path.dirname(dest_path)
+        if dest_dir:
+            os.makedirs(dest_dir, exist_ok=True)
+        # Small files are downloaded in one request, a .part file of download_file isn't resumed
+        _remove_part_file(part_path)
+
+        response = await _get(pool, url)
+        try:
+            transfer_info["ttfb"] = time.monotonic() - request_start_time
+            transfer_info["final_url"] = response.url
+            transfer_info["status_code"] = response.status_code
+            if response.status_code >= 300:
+                raise _HTTPStatusError(url, response.status_code,
+                                       retry.parse_retry_after(response.headers.get("retry-after", None)))
+
+            with open(part_path, 'wb') as file:
+                async for chunk in response.iter_content(chunk_size):
+                    downloaded_bytes += len(chunk)
+                    file.write(chunk)
+                    if hash_obj is not None:
+                        hash_obj.update(chunk)
+        finally:
+            response.release(pool)
+        host_result = True
+    except _HTTPStatusError as e:
+        failure_info["reason"] = "HTTPError"
+        failure_info["status_code"] = e.status_code
+        failure_info["retry_after"] = e.retry_after
+        # Responses which aren't worth retrying (404...) mean the host itself works
+        host_result = e.status_code not in retry.retryable_status_codes
+        return False
+    except _TransferError as e:
+        # The .part file is removed by the next attempt
+        failure_info["reason"] = e.reason
+        host_result = False
+        return False
+    except OSError as e:
+        # Local error (disk full, permission...)
+        failure_info["reason"] = type(e).__name__
+        return False
+    finally:
+        transfer_info["bytes"] = transfer_info.get("bytes", 0) + downloaded_bytes
+        if host_result is None:
+            circuit_breaker.release_request(host)
+        elif host_result:
+            circuit_breaker.record_success(host)
+        else:
+            circuit_breaker.record_failure(host)
+
+    if hash_obj is not None and hash_obj.hexdigest() != sha1:
+        _remove_part_file(part_path)
+        failure_info["reason"] = "ChecksumMismatch"
+        return False
+
+    try:
+        os.replace(part_path, dest_path)
+    except OSError as e:
+        _remove_part_file(part_path)
+        failure_info["reason"] = type(e).__name__
+        return False
+
+    if use_blob_store and sha1 is not None and blob_store.blob_store_enabled:
+        await loop.run_in_executor(None, blob_store.add_to_blob_store, dest_path, sha1)
+    return True
+
+
+async def _download_task(pool, semaphore, url, dest_path, sha1, priority, chunk_size, retry_policy,
+                         transfer_report):
+    start_time = time.monotonic()
+    transfer_info = {}
+    attempt = 0
+    while True:
+        failure_info = {}
+        # The slots aren't held while waiting for the next attempt
+        async with semaphore:
+            async with scheduler.get_scheduler().slot_async(priority):
+                status = await _download_file_async(pool, url, dest_path, sha1, chunk_size, failure_info,
+                                                    transfer_info)
+        reason = failure_info.get("reason", None)
+        if status or reason in (network.offline_mode_error, retry.circuit_open_error):
+            break
+
+        if not retry_policy.should_retry(attempt + 1, failure_info.get("status_code", None)):
+            break
+
+        attempt += 1
+        await asyncio.sleep(retry_policy.get_delay(attempt, failure_info.get("retry_after", None)))
+
+    transfer_report.add_record(url, retry.get_host(url), "ok" if status else (reason or "Failed"),
+                               final_url=transfer_info.get("final_url", url), bytes=transfer_info.get("bytes", 0),
+                               ttfb=transfer_info.get("ttfb", None), duration=time.monotonic() - start_time,
+                               retries=attempt, status_code=transfer_info.get("status_code", None),
+                               from_store=transfer_info.get("from_store", False))
+    return url, dest_path, status, None if status else reason
+
+
+async def _download_all(download_list, name, max_concurrency, retries, chunk_size, no_output, transfer_report,
+                        get_priority):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    retry_policy = retry.RetryPolicy(retries=retries)
+    pool = _ConnectionPool()
+
+    downloaded_files = []
+    failed_files = []
+    pbar_download = tqdm(total=len(download_list), desc=f"Downloading {name}", unit="file",
+                         colour='cyan') if not no_output else None
+
+    try:
+        # Tasks are created in priority order, so the semaphore lets them start in that order
+        tasks = [asyncio.ensure_future(_download_task(pool, semaphore, url, dest_path, sha1,
+                                                      get_priority(url, dest_path), chunk_size, retry_policy,
+                                                      transfer_report))
+                 for url, dest_path, sha1 in download_list]
+        for future in asyncio.as_completed(tasks):
+            url, dest_path, status, error = await future
+            if status:
+                downloaded_files.append(dest_path)
+            else:
+                failed_files.append((url, dest_path))
+                if Base.UsingLegacyDownloadOutput:
+                    print(f"[ERR] Failed to download {url}: {error}")
+            if pbar_download:
+                pbar_download.update(1)
+    finally:
+        if pbar_download:
+            pbar_download.close()
+        pool.close()
+
+    return downloaded_files, failed_files
+
+
+def async_download(download_list, name, **kwargs):
+    """
+    Download multiple files on one asyncio event loop (bounded concurrency, no thread per file)
+    Call it from synchronous code (it runs its own event loop).
+    :param download_list: List of (url, dest_path) or (url, dest_path, sha1) (sha1 is verified while downloading)
+    :param name: Progress bar name
+    ***Other parameters***
+    :param max_concurrency: Max in-flight transfers (default: default_max_concurrency)
+    :param retries: Retry count of each file (backoff with jitter. Default: retry.max_retries)
+    :param custom_chunk_size: Read chunk size (default: 65536)
+    :param no_output: Disable progress bar
+    :param priority: Priority class of the files (scheduler.PRIORITY_*) or function(url, dest_path) which returns it.
+     Files with higher priority are started first and every transfer takes a slot of the download scheduler
+     (default: PRIORITY_NORMAL)
+    :param transfer_report: telemetry.TransferReport which receives the record of every file (default: a new report,
+     saved if telemetry.save_transfer_reports is enabled). The finished report of the batch is returned by
+     telemetry.get_last_transfer_report()
+    :return: downloaded_files, failed_files [(url, dest_path)]
+    """
+    # parameter stuff
+    max_concurrency = kwargs.get("max_concurrency", default_max_concurrency)
+    retries = kwargs.get("retries", None)
+    chunk_size = kwargs.get("custom_chunk_size", 65536)
+    no_output = kwargs.get("no_output", Base.UsingLegacyDownloadOutput)
+    priority = kwargs.get("priority", scheduler.PRIORITY_NORMAL)
+    get_priority = _get_priority_function(priority)
+    transfer_report = kwargs.get("transfer_report", None)
+    if transfer_report is None:
+        transfer_report = telemetry.TransferReport(name)
+
+    normalized_list = []
+    for item in download_list:
+        url, dest_path = item[0], item[1]
+        sha1 = item[2] if len(item) > 2 else None
+        normalized_list.append((url, dest_path, sha1))
+
+    if len(normalized_list) == 0:
+        telemetry.finish_transfer_report(transfer_report)
+        return [], []
+
+    # The transfers don't go through requests, so they can't use the proxy settings of the environment
+    if urllib.request.getproxies():
+        print(f"[DEBUG] A proxy is configured. Downloading {name} with multi_thread_download...")
+        return multi_thread_download([[item] for item in normalized_list], name, retries=retries, priority=priority,
+                                     transfer_report=transfer_report)
+
+    normalized_list.sort(key=lambda item: get_priority(item[0], item[1]))
+
+    if not network.check_network_allowed(f"{len(normalized_list)} files ({name})"):
+        telemetry.finish_transfer_report(transfer_report)
+        return [], [(url, dest_path) for url, dest_path, _ in normalized_list]
+
+    downloaded_files, failed_files = asyncio.run(
+        _download_all(normalized_list, name, max_concurrency, retries, chunk_size, no_output, transfer_report,
+                      get_priority))
+    telemetry.finish_transfer_report(transfer_report)
+
+    if failed_files:
+        print("[WARNING] Files that failed after retries:", failed_files)
+    return downloaded_files, failed_files
@@ -0,0 +1,111 @@
+"""
+libs/Utils/blob_store.py
+
+Host-wide content-addressed file store (files are saved by their sha1). Downloaded files which have a sha1 are added
+to the store, files under libraries_dir, runtime folders... are hardlinked from it, so every unique file is downloaded
+and stored only once per host (shared by all instances and launcher roots).
+"""
+import os
+import shutil
+import threading
+from LauncherBase import Base
+from libs.Utils.crypto import verify_checksum
+
+blob_store_enabled = True
+custom_blob_store_dir = None  # Default: <user cache folder>/BakeLauncher/blobs
+
+
+def get_blob_store_dir():
+    if custom_blob_store_dir is not None:
+        return custom_blob_store_dir
+
+    if Base.Platform == "Windows":
+        cache_root = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif Base.Platform == "Darwin":
+        cache_root = os.path.join(os.path.expanduser("~"), "Library", "Caches")
+    else:
+        cache_root = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+
+    return os.path.join(cache_root, "BakeLauncher", "blobs")
+
+
+def get_blob_path(sha1):
+    return os.path.join(get_blob_store_dir(), sha1[:2], sha1)
+
+
+def _link_or_copy(src_path, dest_path):
+    """
+    Hardlink src_path to dest_path (copy if hardlink isn't supported, e.g. different drives)
+    dest_path is replaced atomically, so a file which is a hardlink of another file is never written in place.
+    """
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+
+    # Already linked (rename between two links of the same file does nothing)
+    if os.path.exists(dest_path) and os.path.samefile(src_path, dest_path):
+        return
+
+    tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        try:
+            os.link(src_path, tmp_path)
+        except OSError:
+            shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def link_from_blob_store(sha1, dest_path):
+    """
+    Create dest_path from the stored file of sha1 (the stored file is verified first)
+    :return: Status (not stored or store disabled return False)
+    """
+    if not blob_store_enabled or sha1 is None:
+        return False
+
+    blob_path = get_blob_path(sha1)
+    if not os.path.exists(blob_path):
+        return False
+
+    if not verify_checksum(blob_path, sha1):
+        print(f"[DEBUG] Stored file {blob_path} checksum mismatch. Deleting...")
+        try:
+            os.remove(blob_path)
+        except OSError:
+            pass
+        return False
+
+    try:
+        _link_or_copy(blob_path, dest_path)
+    except OSError as e:
+        print(f"[DEBUG] Unable to link {blob_path} to {dest_path}. ERR:{e}")
+        return False
+
+    return True
+
+
+def add_to_blob_store(file_path, sha1):
+    """
+    Add a verified file (its sha1 must be checked by the caller) to the store
+    :return: Status
+    """
+    if not blob_store_enabled or sha1 is None:
+        return False
+
+    blob_path = get_blob_path(sha1)
+    if os.path.exists(blob_path):
+        return True
+
+    try:
+        _link_or_copy(file_path, blob_path)
+    except OSError as e:
+        print(f"[DEBUG] Unable to add {file_path} to the file store. ERR:{e}")
+        return False
+
+    return True
@@ -0,0 +1,215 @@
+"""
+libs/Utils/cache.py
+
+Cache for remote json data (in-process copy + on-disk copy) with conditional revalidation (ETag/If-Modified-Since)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+from libs.Utils import network, retry
+
+default_cache_ttl = 600  # Seconds before a cached copy needs to be revalidated
+default_cache_timeout = 10  # Seconds before a revalidation request gives up
+
+_memory_cache = {}
+_memory_cache_lock = threading.Lock()
+_url_locks = {}
+
+
+def _get_url_lock(url):
+    with _memory_cache_lock:
+        lock = _url_locks.get(url, None)
+        if lock is None:
+            lock = threading.Lock()
+            _url_locks[url] = lock
+        return lock
+
+
+def _get_cache_file_paths(url, cache_folder, cache_name=None):
+    if cache_name is None:
+        cache_name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    data_path = os.path.join(cache_folder, f"{cache_name}.json")
+    meta_path = os.path.join(cache_folder, f"{cache_name}.meta.json")
+    return data_path, meta_path
+
+
+def _write_file_atomic(file_path, data):
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
+
+
+def _load_disk_cache(url, cache_folder, cache_name):
+    data_path, meta_path = _get_cache_file_paths(url, cache_folder, cache_name)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return None
+
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        with open(data_path, "rb") as f:
+            data = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("url", None) != url:
+        return None
+
+    return {
+        "data": data,
+        "etag": meta.get("etag", None),
+        "last_modified": meta.get("last_modified", None),
+        "fetched_at": meta.get("fetched_at", 0),
+    }
+
+
+def _save_disk_cache(url, cache_folder, cache_name, entry, raw_data=None):
+    data_path, meta_path = _get_cache_file_paths(url, cache_folder, cache_name)
+    meta = {
+        "url": url,
+        "etag": entry["etag"],
+        "last_modified": entry["last_modified"],
+        "fetched_at": entry["fetched_at"],
+    }
+
+    try:
+        os.makedirs(cache_folder, exist_ok=True)
+        if raw_data is not None:
+            _write_file_atomic(data_path, raw_data)
+        _write_file_atomic(meta_path, json.dumps(meta, indent=4).encode("utf-8"))
+    except OSError as e:
+        print(f"[DEBUG] Unable to write cache file for {url}. ERR:{e}")
+
+
+def _remove_disk_cache(url, cache_folder, cache_name):
+    for file_path in _get_cache_file_paths(url, cache_folder, cache_name):
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except OSError as e:
+            print(f"[DEBUG] Unable to remove cache file {file_path}. ERR:{e}")
+
+
+def get_cached_json(url, cache_folder, **kwargs):
+    """
+    Get json data from url. Repeat calls are served from an in-process copy (and an on-disk copy saved in
+    cache_folder) until the ttl expires, after that the copy is revalidated using ETag/If-Modified-Since.
+    :param url: The json data URL
+    :param cache_folder: The folder which the on-disk copy saved to
+    ***Other parameters***
+    :param ttl: Seconds before the cached copy needs to be revalidated (default: default_cache_ttl)
+    :param force_refresh: Revalidate the cached copy even if it does not expire
+    :param cache_name: The on-disk copy file name (default: sha1 of the url)
+    :param timeout: Revalidation request timeout (default: default_cache_timeout)
+    :param cache_only: Return the cached copy even if it expired and never send a request (always enabled in
+    offline mode)
+    :return: json data (If the data can't be fetched and no cached copy exists return None. The cached copy is only
+    returned when the server is unreachable or fails (5xx, 429...). If the data no longer exists (404, 204...) the
+    cached copy is dropped and None is returned)
+    """
+    # parameter stuff
+    ttl = kwargs.get("ttl", default_cache_ttl)
+    force_refresh = kwargs.get("force_refresh", False)
+    cache_name = kwargs.get("cache_name", None)
+    timeout = kwargs.get("timeout", default_cache_timeout)
+    cache_only = kwargs.get("cache_only", False)
+
+    entry = _memory_cache.get(url, None)
+    if entry is not None and not force_refresh and time.time() - entry["fetched_at"] < ttl:
+        return entry["data"]
+
+    with _get_url_lock(url):
+        # Another thread may already revalidate it while waiting for the lock
+        entry = _memory_cache.get(url, None)
+        if entry is None:
+            entry = _load_disk_cache(url, cache_folder, cache_name)
+            if entry is not None:
+                _memory_cache[url] = entry
+
+        if cache_only or not network.check_network_allowed(url, no_output=entry is not None):
+            return entry["data"] if entry is not None else None
+
+        if entry is not None and not force_refresh and time.time() - entry["fetched_at"] < ttl:
+            return entry["data"]
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = network.get(url, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"[DEBUG] Unable to revalidate {url}. ERR:{e}")
+            return entry["data"] if entry is not None else None
+
+        if response.status_code == 304 and entry is not None:
+            entry["fetched_at"] = time.time()
+            _save_disk_cache(url, cache_folder, cache_name, entry)
+            return entry["data"]
+
+        if response.status_code == 204 or (400 <= response.status_code < 500
+                                           and response.status_code not in retry.retryable_status_codes):
+            # The data is removed (renamed or deleted account...), the cached copy is outdated
+            print(f"[DEBUG] {url} no longer has data. Status code: {response.status_code}")
+            if entry is not None:
+                clear_cached_json(url)
+                _remove_disk_cache(url, cache_folder, cache_name)
+            return None
+
+        if response.status_code != 200:
+            print(f"[DEBUG] Unable to revalidate {url}. Status code: {response.status_code}")
+            return entry["data"] if entry is not None else None
+
+        try:
+            data = response.json()
+        except ValueError as e:
+            print(f"[DEBUG] Invalid json data from {url}. ERR:{e}")
+            return entry["data"] if entry is not None else None
+
+        entry = {
+            "data": data,
+            "etag": response.headers.get("ETag", None),
+            "last_modified": response.headers.get("Last-Modified", None),
+            "fetched_at": time.time(),
+        }
+        _memory_cache[url] = entry
+        _save_disk_cache(url, cache_folder, cache_name, entry, response.content)
+        return data
+
+
+def expire_cached_json(url, cache_folder, **kwargs):
+    """
+    Expire the cached copy of url (in-process and on-disk copy), the next get_cached_json revalidates it even if the
+    ttl doesn't expire (The copy is still used in offline mode)
+    :param cache_name: The on-disk copy file name (default: sha1 of the url)
+    """
+    cache_name = kwargs.get("cache_name", None)
+
+    with _get_url_lock(url):
+        entry = _memory_cache.get(url, None)
+        if entry is None:
+            entry = _load_disk_cache(url, cache_folder, cache_name)
+            if entry is None:
+                return
+            _memory_cache[url] = entry
+
+        entry["fetched_at"] = 0
+        _save_disk_cache(url, cache_folder, cache_name, entry)
+
+
+def clear_cached_json(url=None):
+    """
+    Drop the in-process copy of url (If url is None, drop all in-process copies). On-disk copies are kept.
+    """
+    with _memory_cache_lock:
+        if url is None:
+            _memory_cache.clear()
+        else:
+            _memory_cache.pop(url, None)
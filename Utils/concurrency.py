@@ -0,0 +1,107 @@
+"""
+libs/Utils/concurrency.py
+
+Adaptive concurrency (AIMD) for the downloaders. The in-flight download count grows by one after every window of
+successful downloads (while the throughput still grows) and is halved when a download fails or the latency is much
+higher than the best latency seen, within [adaptive_min_workers, adaptive_max_workers].
+"""
+import threading
+import time
+
+adaptive_download_enabled = False  # Use adaptive concurrency in multi_thread_download/multithread_download
+adaptive_min_workers = 2
+adaptive_max_workers = 32
+adaptive_initial_workers = 4
+
+latency_tolerance = 3.0  # Latency (EWMA) higher than best latency * latency_tolerance is congestion
+latency_min_increase = 0.25  # Seconds. Smaller latency increases are ignored (jitter of fast downloads)
+throughput_tolerance = 0.9  # Stop growing if throughput of a window is lower than last window * throughput_tolerance
+latency_ewma_alpha = 0.2
+
+
+class AdaptiveConcurrency:
+    """
+    Limit of in-flight downloads which adapts to the result of every download (thread-safe)
+    Usage: acquire() before a download, release(success, elapsed, size) after it.
+    """
+
+    def __init__(self, min_limit=None, max_limit=None, initial_limit=None):
+        self.min_limit = min_limit if min_limit is not None else adaptive_min_workers
+        self.max_limit = max_limit if max_limit is not None else adaptive_max_workers
+        if initial_limit is None:
+            initial_limit = adaptive_initial_workers
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.in_flight = 0
+
+        self._condition = threading.Condition()
+        self._latency_ewma = None
+        self._best_latency = None
+        self._last_throughput = 0.0
+        self._last_decrease = 0.0
+        self._reset_window(time.monotonic())
+
+    def _reset_window(self, now):
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_successes = 0
+
+    def _update_latency(self, elapsed):
+        if self._latency_ewma is None:
+            self._latency_ewma = elapsed
+        else:
+            self._latency_ewma += latency_ewma_alpha * (elapsed - self._latency_ewma)
+
+        if self._best_latency is None or self._latency_ewma < self._best_latency:
+            self._best_latency = self._latency_ewma
+
+    def _decrease(self, now):
+        # Only one decrease per congestion event (downloads started before it will fail/slow down too)
+        if now - self._last_decrease < (self._latency_ewma or 1.0):
+            return
+
+        self.limit = max(self.min_limit, self.limit // 2)
+        self._last_decrease = now
+        self._last_throughput = 0.0
+        self._reset_window(now)
+
+    def _increase(self, now):
+        elapsed = max(now - self._window_start, 1e-3)
+        throughput = self._window_bytes / elapsed
+
+        if throughput >= self._last_throughput * throughput_tolerance:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+        self._last_throughput = throughput
+        self._reset_window(now)
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, success, elapsed, size=0):
+        """
+        :param success: Download status
+        :param elapsed: Download time (seconds)
+        :param size: Downloaded bytes
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if not success:
+                self._decrease(now)
+            else:
+                self._update_latency(elapsed)
+                self._window_bytes += size
+                self._window_successes += 1
+
+                latency_increase = self._latency_ewma - self._best_latency
+                if self._latency_ewma > self._best_latency * latency_tolerance and \
+                        latency_increase > latency_min_increase:
+                    self._decrease(now)
+                elif self._window_successes >= self.limit:
+                    self._increase(now)
+
+            self._condition.notify_all()
@@ -1,4 +1,5 @@
 import hashlib
+import os
 
 
 def verify_checksum(file_path, expected_sha1):
@@ -13,7 +14,10 @@ def verify_checksum(file_path, expected_sha1):
     return file_sha1 == expected_sha1
 
 
-def verify_checksum_v2(file_path, expected_hash, crypto_type):
+def get_hash_object(crypto_type):
+    """
+    Get a new hash object of crypto_type (for hashing data while it is downloading)
+    """
     hash_dict = {
         'sha1': hashlib.sha1,
         'sha256': hashlib.sha256,
@@ -23,7 +27,11 @@ def verify_checksum_v2(file_path, expected_hash, crypto_type):
     if crypto_type not in hash_dict:
         raise ValueError(f"Unsupported hash type: {crypto_type}")
 
-    hash_obj = hash_dict[crypto_type]()
+    return hash_dict[crypto_type]()
+
+
+def verify_checksum_v2(file_path, expected_hash, crypto_type):
+    hash_obj = get_hash_object(crypto_type)
 
     with open(file_path, "rb") as f:
         for chunk in iter(lambda: f.read(65536), b""):
@@ -31,3 +39,27 @@ def verify_checksum_v2(file_path, expected_hash, crypto_type):
 
     file_sha1 = hash_obj.hexdigest()
     return file_sha1 == expected_hash
+
+
+def verify_existing_file(file_path, expected_sha1=None, expected_size=None):
+    """
+    Check an existing file is complete (size is checked first, so a truncated file doesn't need to be hashed)
+    :param expected_sha1: File sha1 (None = don't check)
+    :param expected_size: File size (None = don't check)
+    :return: Status (file not found or nothing to verify against return False)
+    """
+    if expected_sha1 is None and expected_size is None:
+        return False
+
+    try:
+        file_size = os.path.getsize(file_path)
+    except OSError:
+        return False
+
+    if expected_size is not None and file_size != expected_size:
+        return False
+
+    if expected_sha1 is not None:
+        return verify_checksum(file_path, expected_sha1)
+
+    return True
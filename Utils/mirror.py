@@ -0,0 +1,209 @@
+"""
+libs/Utils/mirror.py
+
+Mirror registry. Origin URL prefixes (Mojang, Azul, GitHub...) are mapped to alternate prefixes (BMCLAPI, an internal
+HTTP cache or any plain HTTP server with the same paths). The origin and its mirrors are probed for latency and download
+URLs are rewritten to the fastest healthy one. download_file falls back to the origin URL if a mirror fails (bad file,
+connection error, server error...) and the mirror isn't used for failed_mirror_ttl seconds. A mirror which doesn't
+have a file (404...) is only skipped for that file.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from libs.Utils import network
+
+probe_timeout = 3  # Seconds
+probe_ttl = 300  # Seconds which a probe result (and the selected prefix) is reused
+failed_mirror_ttl = 600  # Seconds which a failed mirror isn't used
+
+# BMCLAPI (https://bmclapi2.bangbang93.com) mirrors of the Mojang hosts
+bmclapi_mirrors = {
+    "https://piston-meta.mojang.com": "https://bmclapi2.bangbang93.com",
+    "https://piston-data.mojang.com": "https://bmclapi2.bangbang93.com",
+    "https://launchermeta.mojang.com": "https://bmclapi2.bangbang93.com",
+    "https://launcher.mojang.com": "https://bmclapi2.bangbang93.com",
+    "https://libraries.minecraft.net": "https://bmclapi2.bangbang93.com/maven",
+    "https://resources.download.minecraft.net": "https://bmclapi2.bangbang93.com/assets",
+}
+
+_mirrors = {}  # {origin_prefix: [mirror_prefix, ...]}
+_probe_results = {}  # {prefix: (latency (None = unhealthy), probed_at)}
+_failed_mirrors = {}  # {mirror_prefix: failed_at}
+_selected_prefixes = {}  # {origin_prefix: (prefix, selected_at)}
+_lock = threading.Lock()
+_probe_lock = threading.Lock()  # Only one thread probes, other threads wait for its result
+
+
+def add_mirror(origin_prefix, mirror_prefix):
+    """
+    Register mirror_prefix as a mirror of origin_prefix (Example: "https://libraries.minecraft.net",
+    "http://127.0.0.1:8080/maven")
+    """
+    origin_prefix = origin_prefix.rstrip("/")
+    mirror_prefix = mirror_prefix.rstrip("/")
+    with _lock:
+        mirror_list = _mirrors.setdefault(origin_prefix, [])
+        if mirror_prefix not in mirror_list:
+            mirror_list.append(mirror_prefix)
+
+
+def remove_mirror(origin_prefix, mirror_prefix=None):
+    """
+    Remove a mirror of origin_prefix (mirror_prefix is None = remove all mirrors of origin_prefix)
+    """
+    origin_prefix = origin_prefix.rstrip("/")
+    with _lock:
+        if mirror_prefix is None:
+            _mirrors.pop(origin_prefix, None)
+            return
+
+        mirror_list = _mirrors.get(origin_prefix, [])
+        if mirror_prefix.rstrip("/") in mirror_list:
+            mirror_list.remove(mirror_prefix.rstrip("/"))
+
+
+def clear_mirrors():
+    with _lock:
+        _mirrors.clear()
+        _probe_results.clear()
+        _failed_mirrors.clear()
+        _selected_prefixes.clear()
+
+
+def use_bmclapi_mirrors():
+    for origin_prefix, mirror_prefix in bmclapi_mirrors.items():
+        add_mirror(origin_prefix, mirror_prefix)
+
+
+def get_mirrors():
+    with _lock:
+        return {origin_prefix: list(mirror_list) for origin_prefix, mirror_list in _mirrors.items()}
+
+
+def _match_origin_prefix(url):
+    """
+    :return: The longest registered origin prefix of url (not found return None)
+    """
+    matched = None
+    for origin_prefix in _mirrors:
+        if url == origin_prefix or url.startswith(origin_prefix + "/"):
+            if matched is None or len(origin_prefix) > len(matched):
+                matched = origin_prefix
+    return matched
+
+
+def probe_latency(prefix):
+    """
+    Probe prefix (any HTTP response below 500 is healthy)
+    :return: latency (seconds. unhealthy return None)
+    """
+    if not network.check_network_allowed(prefix, no_output=True):
+        return None
+
+    start_time = time.monotonic()
+    try:
+        response = network.head(prefix + "/", timeout=probe_timeout, allow_redirects=False)
+    except requests.exceptions.RequestException:
+        return None
+
+    if response.status_code >= 500:
+        return None
+    return time.monotonic() - start_time
+
+
+def _get_latency(prefix):
+    with _lock:
+        result = _probe_results.get(prefix, None)
+    if result is not None and time.monotonic() - result[1] < probe_ttl:
+        return result[0]
+
+    latency = probe_latency(prefix)
+    with _lock:
+        _probe_results[prefix] = (latency, time.monotonic())
+    return latency
+
+
+def _is_mirror_failed(prefix):
+    failed_at = _failed_mirrors.get(prefix, None)
+    return failed_at is not None and time.monotonic() - failed_at < failed_mirror_ttl
+
+
+def get_fastest_prefix(origin_prefix):
+    """
+    Get the fastest healthy prefix of origin_prefix and its mirrors (nothing is healthy return origin_prefix)
+    """
+    with _lock:
+        selected = _selected_prefixes.get(origin_prefix, None)
+    if selected is not None and time.monotonic() - selected[1] < probe_ttl and not _is_mirror_failed(selected[0]):
+        return selected[0]
+
+    with _probe_lock:
+        with _lock:
+            selected = _selected_prefixes.get(origin_prefix, None)
+        if selected is not None and time.monotonic() - selected[1] < probe_ttl and not _is_mirror_failed(selected[0]):
+            return selected[0]
+
+        fastest_prefix = _probe_fastest_prefix(origin_prefix)
+        with _lock:
+            _selected_prefixes[origin_prefix] = (fastest_prefix, time.monotonic())
+        return fastest_prefix
+
+
+def _probe_fastest_prefix(origin_prefix):
+    with _lock:
+        candidates = [origin_prefix] + [prefix for prefix in _mirrors.get(origin_prefix, [])
+                                        if not _is_mirror_failed(prefix)]
+    if len(candidates) == 1:
+        return origin_prefix
+
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        latency_list = list(executor.map(_get_latency, candidates))
+
+    fastest_prefix = origin_prefix
+    fastest_latency = None
+    for prefix, latency in zip(candidates, latency_list):
+        if latency is None:
+            continue
+        if fastest_latency is None or latency < fastest_latency:
+            fastest_prefix = prefix
+            fastest_latency = latency
+    return fastest_prefix
+
+
+def rewrite_url(url):
+    """
+    Rewrite url to the fastest healthy mirror (url without registered mirrors is returned as it is)
+    """
+    with _lock:
+        origin_prefix = _match_origin_prefix(url)
+    if origin_prefix is None:
+        return url
+
+    prefix = get_fastest_prefix(origin_prefix)
+    if prefix == origin_prefix:
+        return url
+    return prefix + url[len(origin_prefix):]
+
+
+def report_mirror_failure(mirror_url, reason="ChecksumMismatch"):
+    """
+    Stop using the mirror of mirror_url for failed_mirror_ttl seconds (it sent a file with mismatched hash, it is
+    unreachable, it sent a server error...)
+    :param reason: Failure reason of the download (failure_info["reason"])
+    """
+    with _lock:
+        # The longest prefix is the mirror which served the URL (Example: ".../maven" instead of its host prefix)
+        matched = None
+        for mirror_list in _mirrors.values():
+            for prefix in mirror_list:
+                if mirror_url.startswith(prefix + "/") and (matched is None or len(prefix) > len(matched)):
+                    matched = prefix
+        if matched is None:
+            return
+
+        _failed_mirrors[matched] = time.monotonic()
+    if reason == "ChecksumMismatch":
+        print(f"[DEBUG] Mirror {matched} sent a bad file. Stop using it for {failed_mirror_ttl} seconds.")
+    else:
+        print(f"[DEBUG] Mirror {matched} failed ({reason}). Stop using it for {failed_mirror_ttl} seconds.")
@@ -0,0 +1,112 @@
+"""
+libs/Utils/network.py
+
+Network layer shared by the whole library (offline mode, default request timeout and one pooled requests.Session,
+so every download/API call reuses keep-alive connections instead of opening a new TCP+TLS connection)
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+offline_mode = False
+default_timeout = 10  # Seconds (used by requests which didn't set their own timeout)
+offline_mode_error = "OfflineModeEnabled"
+
+pool_connections = 16  # Number of hosts which keep their connection pool
+pool_maxsize = 16  # Max keep-alive connections per host (grows to the downloader worker count)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class OfflineModeError(requests.exceptions.ConnectionError):
+    """Raised by the session layer when a request is sent in offline mode"""
+
+
+def set_offline_mode(enabled=True):
+    """
+    Enable/Disable offline mode. While offline mode is enabled, every network entry point answers from the local
+    caches or fails immediately (returns offline_mode_error as the error message) instead of sending requests.
+    """
+    global offline_mode
+    offline_mode = enabled
+
+
+def is_offline_mode():
+    return offline_mode
+
+
+def check_network_allowed(url, **kwargs):
+    """
+    Check a request to url is allowed (offline mode disabled)
+    :param no_output: Don't print the offline mode message
+    :return: Status
+    """
+    no_output = kwargs.get("no_output", False)
+
+    if not offline_mode:
+        return True
+
+    if not no_output:
+        print(f"[DEBUG] Offline mode is enabled. Skip request to {url}")
+    return False
+
+
+def _mount_adapters(session, max_connections):
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def get_session():
+    """
+    Get the library-wide requests.Session (keep-alive, per-host connection pools of pool_maxsize connections)
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                _mount_adapters(session, pool_maxsize)
+                _session = session
+    return _session
+
+
+def ensure_pool_size(max_workers):
+    """
+    Grow the per-host connection pools to max_workers (called by the downloaders before they start their workers)
+    """
+    global pool_maxsize
+    if max_workers <= pool_maxsize:
+        return
+
+    with _session_lock:
+        if max_workers <= pool_maxsize:
+            return
+        pool_maxsize = max_workers
+        if _session is not None:
+            _mount_adapters(_session, pool_maxsize)
+
+
+def request(method, url, **kwargs):
+    """
+    Send a request through the shared session (default_timeout is used if timeout isn't set)
+    Raise OfflineModeError in offline mode.
+    """
+    if offline_mode:
+        raise OfflineModeError(f"Offline mode is enabled. Skip request to {url}")
+
+    kwargs.setdefault("timeout", default_timeout)
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request("HEAD", url, **kwargs)
@@ -0,0 +1,151 @@
+"""
+libs/Utils/retry.py
+
+Retry policy of the downloaders (exponential backoff with full jitter, Retry-After of 429/503 responses) and a per-host
+circuit breaker, which stops sending new requests to a host after it keeps failing, so one failing host can't stall the
+whole download batch.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+max_retries = 3
+backoff_base = 0.5  # Seconds. Delay of attempt n = random(0, min(backoff_max, backoff_base * 2 ** n))
+backoff_max = 30
+retry_after_max = 60  # Max seconds to wait for a Retry-After header
+
+circuit_failure_threshold = 5  # Consecutive failures which open the circuit of a host
+circuit_reset_timeout = 30  # Seconds before an open circuit lets one request through again
+
+# Status codes which are worth retrying (other 4xx responses won't change)
+retryable_status_codes = (408, 425, 429, 500, 502, 503, 504)
+
+circuit_open_error = "CircuitOpen"
+
+
+def get_host(url):
+    return urlsplit(url).netloc
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header (seconds or HTTP-date)
+    :return: seconds (invalid return None)
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_time is None:
+        return None
+
+    return max(0.0, retry_time.timestamp() - time.time())
+
+
+class RetryPolicy:
+    def __init__(self, retries=None, base=None, maximum=None):
+        self.retries = retries if retries is not None else max_retries
+        self.base = base if base is not None else backoff_base
+        self.maximum = maximum if maximum is not None else backoff_max
+
+    def should_retry(self, attempt, status_code=None):
+        """
+        :param attempt: Failed attempt count (starts from 1)
+        :param status_code: HTTP status code of the failed attempt (None = connection error/checksum mismatch)
+        """
+        if attempt > self.retries:
+            return False
+        return status_code is None or status_code in retryable_status_codes
+
+    def get_delay(self, attempt, retry_after=None):
+        """
+        Get the delay before the next attempt (Retry-After of the server is used if it has)
+        """
+        if retry_after is not None:
+            return min(retry_after, retry_after_max)
+        return random.uniform(0, min(self.maximum, self.base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker (thread-safe)
+    closed: requests are sent | open: requests fail immediately | half-open (after circuit_reset_timeout): one request
+    is sent, success closes the circuit and failure opens it again
+    """
+
+    def __init__(self, failure_threshold=None, reset_timeout=None):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        self._trial_hosts = set()
+        self._lock = threading.Lock()
+
+    @property
+    def failure_threshold(self):
+        return self._failure_threshold if self._failure_threshold is not None else circuit_failure_threshold
+
+    @property
+    def reset_timeout(self):
+        return self._reset_timeout if self._reset_timeout is not None else circuit_reset_timeout
+
+    def allow_request(self, host):
+        with self._lock:
+            opened_at = self._opened_at.get(host, None)
+            if opened_at is None:
+                return True
+
+            if time.monotonic() - opened_at < self.reset_timeout or host in self._trial_hosts:
+                return False
+
+            # Half-open
+            self._trial_hosts.add(host)
+            return True
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial_hosts.discard(host)
+
+    def record_failure(self, host):
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if host in self._trial_hosts or failures >= self.failure_threshold:
+                if host not in self._opened_at or host in self._trial_hosts:
+                    print(f"[DEBUG] Too many failed requests to {host}. Stop sending requests to it for "
+                          f"{self.reset_timeout} seconds.")
+                self._opened_at[host] = time.monotonic()
+                self._trial_hosts.discard(host)
+
+    def release_request(self, host):
+        """
+        End an allowed request without a result (a local error says nothing about the host). A half-open host gets
+        a new trial request.
+        """
+        with self._lock:
+            self._trial_hosts.discard(host)
+
+    def is_open(self, host):
+        with self._lock:
+            return host in self._opened_at
+
+
+_circuit_breaker = CircuitBreaker()
+
+
+def get_circuit_breaker():
+    """
+    Get the library-wide circuit breaker
+    """
+    return _circuit_breaker
@@ -0,0 +1,136 @@
+"""
+libs/Utils/scheduler.py
+
+Priority-aware download scheduler. Every download takes a slot from one library-wide concurrency budget, and when a slot
+is free the waiting download with the highest priority class gets it, so launch-critical files (client.jar, natives,
+LWJGL) go first and bulk work (runtimes, assets) uses the remaining slots. Threads (acquire/slot) and coroutines of the
+asyncio download engine (acquire_async/slot_async) wait in the same queue.
+"""
+import asyncio
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+PRIORITY_CRITICAL = 0  # client.jar, natives, LWJGL
+PRIORITY_NORMAL = 1  # Libraries
+PRIORITY_BULK = 2  # Java runtime files, assets
+
+# Max downloads in flight (all batches). Thread downloaders are limited by their worker count too, the budget is mostly
+# used by the asyncio download engine which keeps hundreds of small transfers in flight
+download_budget = 256
+
+
+def get_library_priority(url, dest_path):
+    """
+    Priority of a library file (LWJGL is needed to start the game window, so it is critical)
+    """
+    if "lwjgl" in dest_path.replace("\\", "/").lower():
+        return PRIORITY_CRITICAL
+    return PRIORITY_NORMAL
+
+
+class DownloadScheduler:
+    """
+    Concurrency budget which is handed out by priority (FIFO within the same priority class, thread-safe)
+    """
+
+    def __init__(self, budget=None):
+        self._budget = budget
+        self.in_flight = 0
+        self._waiting = []  # Heap of (priority, ticket, future) (future is None = a waiting thread)
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+
+    @property
+    def budget(self):
+        return self._budget if self._budget is not None else download_budget
+
+    def _grant_async_waiters(self):
+        """
+        Hand out free slots to waiting coroutines (they can't wake up by themselves like threads). The condition must be
+        held.
+        """
+        while len(self._waiting) > 0 and self.in_flight < self.budget:
+            future = self._waiting[0][2]
+            if future is None:
+                # The first waiter is a thread, it takes the slot itself
+                return
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            future.get_loop().call_soon_threadsafe(_set_future_done, future)
+
+    def acquire(self, priority=PRIORITY_NORMAL):
+        with self._condition:
+            waiter = (priority, next(self._tickets), None)
+            heapq.heappush(self._waiting, waiter)
+            while self.in_flight >= self.budget or self._waiting[0] is not waiter:
+                self._condition.wait()
+
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            # The next waiter may be able to take a slot too
+            self._grant_async_waiters()
+            self._condition.notify_all()
+
+    async def acquire_async(self, priority=PRIORITY_NORMAL):
+        """
+        acquire() for coroutines (the event loop isn't blocked while waiting)
+        """
+        future = asyncio.get_running_loop().create_future()
+        with self._condition:
+            waiter = (priority, next(self._tickets), future)
+            heapq.heappush(self._waiting, waiter)
+            self._grant_async_waiters()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._condition:
+                granted = not any(item is waiter for item in self._waiting)
+                if not granted:
+                    self._waiting.remove(waiter)
+                    heapq.heapify(self._waiting)
+                    self._grant_async_waiters()
+                    self._condition.notify_all()
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._grant_async_waiters()
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_NORMAL):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, priority=PRIORITY_NORMAL):
+        await self.acquire_async(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def _set_future_done(future):
+    # The waiting coroutine may be cancelled before the event loop runs this
+    if not future.done():
+        future.set_result(None)
+
+
+_scheduler = DownloadScheduler()
+
+
+def get_scheduler():
+    """
+    Get the library-wide download scheduler
+    """
+    return _scheduler
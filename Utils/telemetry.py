@@ -0,0 +1,157 @@
+"""
+libs/Utils/telemetry.py
+
+Per-download telemetry. Every file of a download batch adds a record (url, host, bytes, time to first byte, duration,
+retries, status) to a TransferReport, which also has the aggregate throughput and a latency histogram. Reports can be
+saved as JSON next to the launcher logs.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from LauncherBase import Base
+
+save_transfer_reports = False  # Save the report of every download batch
+transfer_report_dir = None  # Default: <launcher_root_dir>/logs
+
+# Upper bounds (milliseconds) of the time to first byte histogram buckets
+latency_histogram_buckets = (50, 100, 250, 500, 1000, 2500, 5000)
+
+_last_transfer_report = threading.local()
+
+
+def get_transfer_report_dir():
+    if transfer_report_dir is not None:
+        return transfer_report_dir
+    return os.path.join(Base.launcher_root_dir, "logs")
+
+
+def _get_histogram_bucket(latency):
+    latency_ms = latency * 1000
+    for bucket in latency_histogram_buckets:
+        if latency_ms < bucket:
+            return f"<{bucket}ms"
+    return f">={latency_histogram_buckets[-1]}ms"
+
+
+class TransferReport:
+    """
+    Report of a download batch (thread-safe)
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.finished_at = None
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add_record(self, url, host, status, **kwargs):
+        """
+        :param status: "ok" or the failure reason
+        ***Other parameters***
+        :param final_url: URL which the file is downloaded from (mirror...)
+        :param bytes: Downloaded bytes
+        :param ttfb: Time to first byte of the last attempt (seconds. None = no response)
+        :param duration: Total duration including retries (seconds)
+        :param retries: Retry count
+        :param status_code: HTTP status code of the last attempt
+        :param from_store: The file is linked from the file store (no request is sent)
+        """
+        record = {
+            "url": url,
+            "host": host,
+            "final_url": kwargs.get("final_url", url),
+            "bytes": kwargs.get("bytes", 0),
+            "ttfb": kwargs.get("ttfb", None),
+            "duration": kwargs.get("duration", 0.0),
+            "retries": kwargs.get("retries", 0),
+            "status": status,
+            "status_code": kwargs.get("status_code", None),
+            "from_store": kwargs.get("from_store", False),
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def get_summary(self):
+        with self._lock:
+            records = list(self.records)
+
+        finished_at = self.finished_at if self.finished_at is not None else time.time()
+        duration = max(finished_at - self.started_at, 1e-6)
+        total_bytes = sum(record["bytes"] for record in records)
+
+        histogram = {f"<{bucket}ms": 0 for bucket in latency_histogram_buckets}
+        histogram[f">={latency_histogram_buckets[-1]}ms"] = 0
+        for record in records:
+            if record["ttfb"] is not None:
+                histogram[_get_histogram_bucket(record["ttfb"])] += 1
+
+        return {
+            "file_count": len(records),
+            "succeeded": sum(1 for record in records if record["status"] == "ok"),
+            "failed": sum(1 for record in records if record["status"] != "ok"),
+            "from_store": sum(1 for record in records if record["from_store"]),
+            "retries": sum(record["retries"] for record in records),
+            "total_bytes": total_bytes,
+            "duration": duration,
+            "throughput": total_bytes / duration,  # Bytes per second
+            "latency_histogram": histogram,
+        }
+
+    def to_dict(self):
+        with self._lock:
+            records = list(self.records)
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "summary": self.get_summary(),
+            "files": records,
+        }
+
+    def save(self, path=None):
+        """
+        Save the report as JSON (default path: <report dir>/transfer-<name>-<time>.json)
+        :return: path (failed return None)
+        """
+        if path is None:
+            file_time = datetime.fromtimestamp(self.started_at).strftime("%Y%m%d-%H%M%S-%f")
+            safe_name = "".join(char if char.isalnum() or char in "-_" else "_" for char in self.name)
+            path = os.path.join(get_transfer_report_dir(), f"transfer-{safe_name}-{file_time}.json")
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=4)
+        except OSError as e:
+            print(f"[DEBUG] Unable to save transfer report {path}. ERR:{e}")
+            return None
+
+        return path
+
+
+def finish_transfer_report(report):
+    """
+    Finish a report of a download batch (and save it if save_transfer_reports is enabled and it has records). It
+    becomes the last report of the calling thread (get_last_transfer_report).
+    """
+    report.finish()
+    _last_transfer_report.report = report
+    if save_transfer_reports and len(report.records) > 0:
+        report.save()
+    return report
+
+
+def get_last_transfer_report():
+    """
+    Get the report of the last download batch which is finished in the calling thread (multi_thread_download,
+    multithread_download, async_download, download_libraries, download_natives...). Pass transfer_report=... to the
+    downloader instead if the report is needed while it is downloading.
+    :return: TransferReport (no batch is finished in this thread return None)
+    """
+    return getattr(_last_transfer_report, "report", None)
@@ -1,55 +1,562 @@
 import sys
+import time
 import zipfile
+import lzma
 import requests
 import os
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from LauncherBase import Base
-from libs.Utils.crypto import verify_checksum, verify_checksum_v2
+from libs.Utils import network, blob_store, concurrency, retry, mirror, scheduler, telemetry
+from libs.Utils.crypto import verify_checksum, verify_checksum_v2, get_hash_object
 
 VersionManifestURl = "https://piston-meta.mojang.com/mc/game/version_manifest_v2.json"
 LegacyVersionManifestURl = ("https://github.com/Techarerm/BakeLauncher-Library/raw/refs/heads/main/Legacy"
                             "%20Manifest/version_manifest_legacy.json")
 
+# Segmented download (download_file(segmented=True)): files above the threshold are split into ranges which are
+# downloaded concurrently (the server must advertise "Accept-Ranges: bytes")
+segmented_download_threshold = 16 * 1024 * 1024  # Bytes
+segmented_download_count = 4  # Max concurrent ranges of a file
+min_segment_size = 4 * 1024 * 1024  # Bytes
+
+
+def _get_content_range_start(response):
+    """
+    Get the first byte position of a 206 response ("Content-Range: bytes <start>-<end>/<size>")
+    :return: start (unknown return None)
+    """
+    content_range = response.headers.get("Content-Range", "")
+    if not content_range.startswith("bytes "):
+        return None
+
+    try:
+        return int(content_range[6:].split("-", 1)[0])
+    except ValueError:
+        return None
+
+
+def _get_content_range_size(response):
+    """
+    Get the complete length of a 206/416 response ("Content-Range: bytes <start>-<end>/<size>" or "bytes */<size>")
+    :return: size (unknown return None)
+    """
+    content_range = response.headers.get("Content-Range", "")
+    if not content_range.startswith("bytes ") or "/" not in content_range:
+        return None
+
+    try:
+        return int(content_range.rsplit("/", 1)[1])
+    except ValueError:
+        return None
+
+
+def _load_resume_validator(part_path):
+    """
+    :return: The validator (ETag or Last-Modified) of the response which the .part file is downloaded from (not found
+     return None)
+    """
+    try:
+        with open(f"{part_path}.validator", "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _save_resume_validator(part_path, response):
+    """
+    Save the validator of response next to the .part file, it is sent as If-Range when the download is resumed (a
+    strong ETag, else Last-Modified. Weak ETags can't be used in If-Range)
+    """
+    validator = response.headers.get("ETag", None)
+    if not validator or validator.startswith("W/"):
+        validator = response.headers.get("Last-Modified", None)
+
+    if validator is None:
+        if os.path.exists(f"{part_path}.validator"):
+            os.remove(f"{part_path}.validator")
+        return
+
+    with open(f"{part_path}.validator", "w") as f:
+        f.write(validator)
+
+
+def _remove_part_file(part_path):
+    """
+    Remove a .part file and its validator
+    """
+    for file_path in (part_path, f"{part_path}.validator"):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+class _RangeNotSupported(Exception):
+    pass
+
+
+def _download_segment(url, segments_path, start, end, chunk_size):
+    """
+    Download bytes start-end of url into segments_path (at the same position)
+    :return: Written bytes
+    """
+    written_bytes = 0
+    with network.get(url, stream=True, headers={"Range": f"bytes={start}-{end}"}) as response:
+        response.raise_for_status()
+        if response.status_code != 206 or _get_content_range_start(response) != start:
+            raise _RangeNotSupported()
+
+        with open(segments_path, 'r+b') as file:
+            file.seek(start)
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                chunk = chunk[:end - start + 1 - written_bytes]
+                file.write(chunk)
+                written_bytes += len(chunk)
+
+    if written_bytes != end - start + 1:
+        raise requests.exceptions.ChunkedEncodingError(f"Segment {start}-{end} of {url} is incomplete.")
+    return written_bytes
+
+
+def _remove_segments_file(segments_path):
+    try:
+        if os.path.exists(segments_path):
+            os.remove(segments_path)
+    except OSError as e:
+        print(f"[DEBUG] Unable to remove {segments_path}. ERR:{e}")
+
+
+def _download_file_segmented(url, dest_path, file_hash, crypto_type, chunk_size, no_output, failure_info,
+                             transfer_info):
+    """
+    Download a file in segments (ranges are downloaded concurrently and written into a preallocated file)
+    :return: Status (None = the file is too small or the server doesn't support range requests)
+    """
+    request_start_time = time.monotonic()
+    try:
+        response = network.head(url, allow_redirects=True)
+    except requests.exceptions.RequestException:
+        return None
+
+    try:
+        file_size = int(response.headers.get("Content-Length", 0))
+    except ValueError:
+        return None
+    if response.status_code != 200 or response.headers.get("Accept-Ranges", "").lower() != "bytes" \
+            or file_size < segmented_download_threshold:
+        return None
+
+    # Use the redirected URL, so the ranges don't follow the redirect again
+    final_url = response.url
+    transfer_info["final_url"] = final_url
+    transfer_info["ttfb"] = time.monotonic() - request_start_time
+
+    segment_count = max(1, min(segmented_download_count, file_size // min_segment_size))
+    segment_size = -(-file_size // segment_count)
+    segments = [(start, min(start + segment_size, file_size) - 1) for start in range(0, file_size, segment_size)]
+
+    segments_path = f"{dest_path}.segments"
+    circuit_breaker = retry.get_circuit_breaker()
+    host = retry.get_host(url)
+    downloaded_bytes = 0
+    error = None
+    try:
+        with open(segments_path, 'wb') as file:
+            file.truncate(file_size)
+
+        network.ensure_pool_size(len(segments))
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            futures = [executor.submit(_download_segment, final_url, segments_path, start, end, chunk_size)
+                       for start, end in segments]
+            for future in as_completed(futures):
+                try:
+                    downloaded_bytes += future.result()
+                except (OSError, _RangeNotSupported) as e:
+                    # OSError = request errors (RequestException) and write errors (disk full...)
+                    error = error or e
+    except OSError as e:
+        error = e
+
+    transfer_info["bytes"] = transfer_info.get("bytes", 0) + downloaded_bytes
+    if error is not None:
+        _remove_segments_file(segments_path)
+        if isinstance(error, _RangeNotSupported):
+            print(f"[DEBUG] {final_url} doesn't support range requests. Downloading it over one stream...")
+            return None
+
+        if not no_output:
+            print(f"[ERR] Failed to download {url}: {error}")
+        failure_info["reason"] = type(error).__name__
+        if isinstance(error, requests.exceptions.RequestException):
+            if error.response is not None:
+                failure_info["status_code"] = error.response.status_code
+                failure_info["retry_after"] = retry.parse_retry_after(
+                    error.response.headers.get("Retry-After", None))
+            circuit_breaker.record_failure(host)
+        return False
+
+    circuit_breaker.record_success(host)
+    transfer_info["status_code"] = 206
+
+    try:
+        # Segments are finished out of order, so the file is hashed after it is completed
+        if file_hash is not None:
+            hash_obj = get_hash_object(crypto_type)
+            with open(segments_path, 'rb') as file:
+                for chunk in iter(lambda: file.read(65536), b""):
+                    hash_obj.update(chunk)
+            if hash_obj.hexdigest() != file_hash:
+                _remove_segments_file(segments_path)
+                if not no_output:
+                    print(f"Warning: File {dest_path} checksum mismatch. Deleting...")
+                failure_info["reason"] = "ChecksumMismatch"
+                return False
+
+        os.replace(segments_path, dest_path)
+    except OSError as e:
+        _remove_segments_file(segments_path)
+        if not no_output:
+            print(f"[ERR] Failed to write {dest_path}: {e}")
+        failure_info["reason"] = type(e).__name__
+        return False
+    return True
+
 
 def download_file(url, dest_path, **kwargs):
     """
     Downloads a file from a URL and saves it to dest_path.
+    The file is downloaded to "<dest_path>.part" and renamed to dest_path after it is completed (and verified). If the
+    .part file already exists (interrupted download), only the missing bytes are requested (Range request with
+    If-Range, so a changed remote file is sent again as a whole). A .part file is only resumed if its validator
+    (ETag/Last-Modified) was saved or the file has a hash to verify it.
+    Files with sha1 are linked from the host-wide file store (blob_store) if it is stored, and added to it after
+    they are downloaded.
+    The file is hashed while it is downloading (a file with mismatched hash is deleted, it is never read again).
+    :param sha1: Expected sha1 of the file
+    :param file_hash: Expected hash of the file (crypto_type hash. Default: sha1)
+    :param crypto_type: Hash type of file_hash (sha1, sha256, md5)
+    :param failure_info: A dict which receives the detail of the failure (reason, status_code, retry_after)
+    Requests to a host which the circuit breaker (retry.get_circuit_breaker) stopped fail immediately.
+    URLs which have registered mirrors (mirror.add_mirror) are downloaded from the fastest healthy mirror first, if
+    it fails the file is downloaded from the origin URL.
+    :param use_mirror: Use registered mirrors (default: True)
+    :param transfer_info: A dict which receives the transfer detail (final_url, bytes, ttfb, status_code, from_store)
+    :param segmented: Download files above segmented_download_threshold in concurrent ranges (the server must support
+     range requests, else the file is downloaded over one stream)
+    :param decompress: "lzma" = the URL sends an LZMA compressed file, it is decompressed while it is downloading
+     (sha1/file_hash is the hash of the decompressed file. Compressed downloads aren't resumed or segmented)
     """
     # parameter stuff
     with_verify = kwargs.get('with_verify', True)
     sha1 = kwargs.get('sha1', None)
     no_output = kwargs.get('no_output', False)
     chunk_size = kwargs.get('custom_chunk_size', 8192)
+    decompress = kwargs.get('decompress', None)
+    # Offsets of the decompressed .part file don't match the compressed file
+    resume = kwargs.get('resume', True) and decompress is None
+    crypto_type = kwargs.get('crypto_type', 'sha1')
+    file_hash = kwargs.get('file_hash', sha1) if with_verify else None
+    if crypto_type != "sha1":
+        sha1 = None
+    elif file_hash is not None:
+        sha1 = file_hash
+    use_blob_store = kwargs.get('use_blob_store', True) and with_verify
+    failure_info = kwargs.get('failure_info', None)
+    if failure_info is None:
+        failure_info = {}
+    transfer_info = kwargs.get('transfer_info', None)
+    if transfer_info is None:
+        transfer_info = {}
+
+    if use_blob_store and blob_store.link_from_blob_store(sha1, dest_path):
+        _remove_part_file(f"{dest_path}.part")
+        transfer_info["from_store"] = True
+        return True
 
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
+    if kwargs.get('use_mirror', True):
+        mirror_url = mirror.rewrite_url(url)
+        if mirror_url != url:
+            mirror_failure_info = {}
+            if download_file(mirror_url, dest_path, **dict(kwargs, use_mirror=False, use_blob_store=False,
+                                                            failure_info=mirror_failure_info)):
+                if use_blob_store:
+                    blob_store.add_to_blob_store(dest_path, sha1)
+                return True
+
+            if mirror_failure_info.get("reason", None) == network.offline_mode_error:
+                failure_info.update(mirror_failure_info)
+                return False
+            # Bad files, connection errors, server errors... The origin is used until the mirror is healthy. A mirror
+            # which doesn't have the file (404...) is only skipped for this file
+            mirror_status_code = mirror_failure_info.get("status_code", None)
+            if mirror_status_code is None or mirror_status_code >= 500:
+                mirror.report_mirror_failure(mirror_url, mirror_failure_info.get("reason", None) or "Failed")
+            if not no_output:
+                print(f"[DEBUG] Failed to download {mirror_url} from the mirror. Downloading it from {url}...")
+
+    if not network.check_network_allowed(url, no_output=no_output):
+        failure_info["reason"] = network.offline_mode_error
+        return False
+
+    circuit_breaker = retry.get_circuit_breaker()
+    host = retry.get_host(url)
+    # A restarted download was already allowed (a half-open host must not refuse its own trial request)
+    if not kwargs.get('skip_circuit_check', False) and not circuit_breaker.allow_request(host):
+        failure_info["reason"] = retry.circuit_open_error
+        return False
 
+    part_path = f"{dest_path}.part"
+    resumed = False
+    downloaded_bytes = 0
+    # The outcome of the host is recorded on every path, else a half-open host never gets another trial request
+    # (None = nothing to record)
+    host_result = None
+    try:
         # Create the directory if it doesn't exist
         dest_dir = os.path.dirname(dest_path)
         if dest_dir:
             os.makedirs(dest_dir, exist_ok=True)
 
-        # Write the file to dest_path
-        with open(dest_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                file.write(chunk)
-
-        if with_verify:
-            if sha1 is not None:
-                Status = verify_checksum(dest_path, sha1)
-                if not Status:
-                    return False
-
+        # An interrupted single stream download is resumed instead
+        if kwargs.get('segmented', False) and decompress is None and not os.path.exists(part_path):
+            segmented_status = _download_file_segmented(url, dest_path, file_hash, crypto_type, chunk_size,
+                                                        no_output, failure_info, transfer_info)
+            if segmented_status is not None:
+                if segmented_status and use_blob_store:
+                    blob_store.add_to_blob_store(dest_path, sha1)
+                return segmented_status
+
+        resume_offset = 0
+        resume_validator = None
+        if os.path.exists(part_path):
+            resume_validator = _load_resume_validator(part_path) if resume else None
+            # Without a validator, only a file which can be verified by its hash is resumed
+            if resume and (resume_validator is not None or file_hash is not None):
+                resume_offset = os.path.getsize(part_path)
+            else:
+                _remove_part_file(part_path)
+
+        transfer_info["final_url"] = url
+        transfer_info["ttfb"] = None
+        request_start_time = time.monotonic()
+        headers = None
+        if resume_offset > 0:
+            headers = {"Range": f"bytes={resume_offset}-"}
+            if resume_validator is not None:
+                # The server sends the whole file (200) if the file was changed since the .part file was downloaded
+                headers["If-Range"] = resume_validator
+        with network.get(url, stream=True, headers=headers) as response:
+            transfer_info["ttfb"] = time.monotonic() - request_start_time
+            transfer_info["status_code"] = response.status_code
+            # The .part file is already complete (the last attempt stopped before it was renamed)
+            part_completed = response.status_code == 416 and resume_offset > 0 \
+                and _get_content_range_size(response) == resume_offset
+            if response.status_code == 416 and resume_offset > 0 and not part_completed:
+                # The .part file isn't a prefix of the remote file anymore, download it again
+                _remove_part_file(part_path)
+                circuit_breaker.record_success(host)
+                return download_file(url, dest_path, **dict(kwargs, skip_circuit_check=True))
+            if not part_completed:
+                response.raise_for_status()
+
+            # Servers which don't support Range requests send the whole file (200)
+            resumed = part_completed or (response.status_code == 206
+                                         and _get_content_range_start(response) == resume_offset)
+
+            hash_obj = get_hash_object(crypto_type) if file_hash is not None else None
+            if hash_obj is not None and resumed:
+                # Only the part which is downloaded before needs to be read
+                with open(part_path, 'rb') as file:
+                    for chunk in iter(lambda: file.read(65536), b""):
+                        hash_obj.update(chunk)
+
+            decompressor = lzma.LZMADecompressor() if decompress == "lzma" else None
+            if resume and not resumed:
+                _save_resume_validator(part_path, response)
+
+            # Write the file to <dest_path>.part
+            if not part_completed:
+                with open(part_path, 'ab' if resumed else 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        downloaded_bytes += len(chunk)
+                        if decompressor is not None:
+                            chunk = decompressor.decompress(chunk)
+                        file.write(chunk)
+                        if hash_obj is not None:
+                            hash_obj.update(chunk)
+                if decompressor is not None and not decompressor.eof:
+                    # The stream is cut (files which have no hash are accepted otherwise)
+                    raise lzma.LZMAError("Compressed data ended before the end-of-stream marker")
+        host_result = True
+    except (lzma.LZMAError, EOFError) as e:
+        _remove_part_file(part_path)
+        transfer_info["bytes"] = transfer_info.get("bytes", 0) + downloaded_bytes
         if not no_output:
-            print(f"Download successful: {dest_path}")
-
-        return True
+            print(f"[ERR] Failed to decompress {url}: {e}")
+        failure_info["reason"] = "LZMAError"
+        host_result = True
+        return False
     except requests.exceptions.RequestException as e:
+        # Keep the .part file, the next attempt will continue from it
+        transfer_info["bytes"] = transfer_info.get("bytes", 0) + downloaded_bytes
         if not no_output:
             print(f"[ERR] Failed to download {url}: {e}")
+        failure_info["reason"] = type(e).__name__
+        if e.response is not None:
+            failure_info["status_code"] = e.response.status_code
+            failure_info["retry_after"] = retry.parse_retry_after(e.response.headers.get("Retry-After", None))
+
+        # Responses which aren't worth retrying (404...) mean the host itself works
+        host_result = e.response is not None and e.response.status_code not in retry.retryable_status_codes
         return False
+    except OSError as e:
+        # Local error (disk full, permission...). Keep the .part file, the next attempt will continue from it
+        transfer_info["bytes"] = transfer_info.get("bytes", 0) + downloaded_bytes
+        if not no_output:
+            print(f"[ERR] Failed to write {dest_path}: {e}")
+        failure_info["reason"] = type(e).__name__
+        return False
+    finally:
+        if host_result is None:
+            circuit_breaker.release_request(host)
+        elif host_result:
+            circuit_breaker.record_success(host)
+        else:
+            circuit_breaker.record_failure(host)
+
+    transfer_info["bytes"] = transfer_info.get("bytes", 0) + downloaded_bytes
+
+    if hash_obj is not None:
+        if hash_obj.hexdigest() != file_hash:
+            _remove_part_file(part_path)
+            if resumed:
+                # The remote file might be changed since the .part file was downloaded
+                print(f"[DEBUG] Resumed download {dest_path} checksum mismatch. Downloading it again...")
+                return download_file(url, dest_path, **kwargs)
+            if not no_output:
+                print(f"Warning: File {dest_path} checksum mismatch. Deleting...")
+            failure_info["reason"] = "ChecksumMismatch"
+            return False
+
+    os.replace(part_path, dest_path)
+    _remove_part_file(part_path)
+
+    if use_blob_store:
+        blob_store.add_to_blob_store(dest_path, sha1)
+
+    if not no_output:
+        print(f"Download successful: {dest_path}")
+
+    return True
+
+
+def download_file_with_retry(url, dest_path, **kwargs):
+    """
+    download_file with the retry policy (exponential backoff with jitter, Retry-After of 429/503 responses)
+    Files of a host which the circuit breaker stopped fail immediately instead of waiting for retries.
+    :param retry_policy: retry.RetryPolicy (default: retry.RetryPolicy())
+    :param concurrency_controller: concurrency.AdaptiveConcurrency which limits every attempt (not held while waiting
+     for the next attempt)
+    :param priority: Priority class of the file (scheduler.PRIORITY_*. Default: PRIORITY_NORMAL)
+    :param failure_info: A dict which receives the failure detail of the last attempt
+    :param transfer_report: telemetry.TransferReport which receives the record of the file
+    Other parameters are passed to download_file
+    :return: Status
+    """
+    # parameter stuff
+    retry_policy = kwargs.pop("retry_policy", None)
+    controller = kwargs.pop("concurrency_controller", None)
+    last_failure_info = kwargs.pop("failure_info", None)
+    transfer_report = kwargs.pop("transfer_report", None)
+    no_output = kwargs.get("no_output", False)
+    if retry_policy is None:
+        retry_policy = retry.RetryPolicy()
+
+    start_time = time.monotonic()
+    transfer_info = {}
+    attempt = 0
+    while True:
+        failure_info = {}
+        status = _download_file_with_concurrency(controller, url, dest_path, failure_info=failure_info,
+                                                 transfer_info=transfer_info, **kwargs)
+        if last_failure_info is not None:
+            last_failure_info.clear()
+            last_failure_info.update(failure_info)
+        if status:
+            break
+
+        # A broken compressed file is the same on the next attempt (the caller falls back to the raw file instead)
+        reason = failure_info.get("reason", None)
+        if reason in (network.offline_mode_error, retry.circuit_open_error, "LZMAError"):
+            break
+        if reason == "ChecksumMismatch" and kwargs.get("decompress", None) is not None:
+            break
+
+        status_code = failure_info.get("status_code", None)
+        if not retry_policy.should_retry(attempt + 1, status_code):
+            break
+
+        attempt += 1
+        delay = retry_policy.get_delay(attempt, failure_info.get("retry_after", None))
+        if not no_output:
+            print(f"Retry {attempt} for {url} in {delay:.1f}s")
+        time.sleep(delay)
+
+    if transfer_report is not None:
+        transfer_report.add_record(url, retry.get_host(url), "ok" if status else failure_info.get("reason", "Failed"),
+                                   final_url=transfer_info.get("final_url", url),
+                                   bytes=transfer_info.get("bytes", 0), ttfb=transfer_info.get("ttfb", None),
+                                   duration=time.monotonic() - start_time, retries=attempt,
+                                   status_code=transfer_info.get("status_code", None),
+                                   from_store=transfer_info.get("from_store", False))
+    return status
+
+
+def _download_file_with_concurrency(controller, url, dest_path, **kwargs):
+    """
+    download_file under the limit of an AdaptiveConcurrency (controller is None = no limit) with a slot of the download
+    scheduler (by priority)
+    The controller is acquired first, so threads which wait for the controller don't hold a slot of the shared budget.
+    """
+    priority = kwargs.pop("priority", scheduler.PRIORITY_NORMAL)
+    if controller is None:
+        with scheduler.get_scheduler().slot(priority):
+            return download_file(url, dest_path, **kwargs)
+
+    controller.acquire()
+    status = False
+    elapsed = 0.0
+    try:
+        with scheduler.get_scheduler().slot(priority):
+            # Waiting for the slot isn't a part of the download latency
+            start_time = time.monotonic()
+            status = download_file(url, dest_path, **kwargs)
+            elapsed = time.monotonic() - start_time
+        return status
+    finally:
+        size = os.path.getsize(dest_path) if status and os.path.exists(dest_path) else 0
+        controller.release(status, elapsed, size)
+
+
+def _get_priority_function(priority):
+    """
+    :param priority: Priority class or function(url, dest_path) which returns the priority class of a file
+    """
+    if callable(priority):
+        return priority
+    return lambda url, dest_path: priority
+
+
+def _get_download_concurrency(max_workers, adaptive):
+    """
+    :return: worker count, AdaptiveConcurrency (None if adaptive is disabled)
+    """
+    if not adaptive:
+        return max_workers, None
+
+    # Downloads above the shared budget of the scheduler can't be in flight anyway
+    controller = concurrency.AdaptiveConcurrency(
+        max_limit=min(concurrency.adaptive_max_workers, scheduler.get_scheduler().budget), initial_limit=max_workers)
+    return controller.max_limit, controller
 
 
 def extract_zip(zip_path, extract_to):
@@ -61,13 +568,36 @@ def extract_zip(zip_path, extract_to):
         print(f"[ERR] Error extracting {zip_path}: {e}")
 
 
-def multi_thread_download(nested_urls_and_paths, name, max_workers=5, retries=1):
+def multi_thread_download(nested_urls_and_paths, name, max_workers=5, retries=None, **kwargs):
     """
     Downloads multiple files using multiple threads with retry attempts.
-    nested_urls_and_paths should be a nested list where each element is a list containing a tuple of (url, dest_path).
+    nested_urls_and_paths should be a nested list where each element is a list containing a tuple of (url, dest_path)
+    or (url, dest_path, sha1).
+    :param retries: Retry count of each file (backoff with jitter. Default: retry.max_retries)
+    :param adaptive: Adapt the in-flight download count (starts from max_workers) to throughput, errors and latency
+     (default: concurrency.adaptive_download_enabled)
+    :param priority: Priority class of the files (scheduler.PRIORITY_*) or function(url, dest_path) which returns it.
+     Files with higher priority are downloaded first (default: PRIORITY_NORMAL)
+    :param transfer_report: telemetry.TransferReport which receives the record of every file (default: a new report,
+     saved if telemetry.save_transfer_reports is enabled). The finished report of the batch is returned by
+     telemetry.get_last_transfer_report()
     """
+    # parameter stuff
+    adaptive = kwargs.get("adaptive", concurrency.adaptive_download_enabled)
+    get_priority = _get_priority_function(kwargs.get("priority", scheduler.PRIORITY_NORMAL))
+    transfer_report = kwargs.get("transfer_report", None)
+    if transfer_report is None:
+        transfer_report = telemetry.TransferReport(name)
+
     # Flatten the nested list into a single list of (url, dest_path) tuples
-    urls_and_paths = [item for sublist in nested_urls_and_paths for item in sublist]
+    urls_and_paths = []
+    file_sha1_dict = {}
+    for sublist in nested_urls_and_paths:
+        for item in sublist:
+            urls_and_paths.append((item[0], item[1]))
+            if len(item) > 2:
+                file_sha1_dict[item[1]] = item[2]
+    urls_and_paths.sort(key=lambda url_and_path: get_priority(*url_and_path))
     # Calculate the total number of files to download (half the length of the list)
     total_files = len(urls_and_paths)
 
@@ -75,19 +605,18 @@ def multi_thread_download(nested_urls_and_paths, name, max_workers=5, retries=1)
     failed_files = []
     sys.stderr.flush()
     no_output = True
+    max_workers, controller = _get_download_concurrency(max_workers, adaptive)
+    network.ensure_pool_size(max_workers)
+    retry_policy = retry.RetryPolicy(retries=retries)
 
     if Base.UsingLegacyDownloadOutput:
         no_output = False
 
-    def download_with_retry(url, dest_path, retry_count):
+    def download_with_retry(url, dest_path):
         """Attempts to download a file with retries."""
-        for attempt in range(retry_count + 1):
-            success = download_file(url, dest_path, no_output=no_output)  # Replace with your download logic
-            if success:
-                return True
-            print(f"Retry {attempt + 1} for {url}")
-        failed_files.append((url, dest_path))  # Track failed downloads
-        return False
+        return download_file_with_retry(url, dest_path, sha1=file_sha1_dict.get(dest_path, None), no_output=no_output,
+                                        retry_policy=retry_policy, concurrency_controller=controller,
+                                        priority=get_priority(url, dest_path), transfer_report=transfer_report)
 
     def futures_download(future_to_url, total_files):
         if Base.UsingLegacyDownloadOutput:
@@ -110,39 +639,41 @@ def multi_thread_download(nested_urls_and_paths, name, max_workers=5, retries=1)
                         success = future.result()  # Wait for the future to complete
                         if success:
                             downloaded_files.append(dest_path)
+                        else:
+                            failed_files.append((url, dest_path))
                     except Exception as exc:
                         print(f"Error downloading {url}: {exc}")
+                        failed_files.append((url, dest_path))
                     # Update the progress bar correctly
                     pbar_download.update(1)
 
-    # Initial download attempt with a progress bar
+    # Download with a progress bar (every file is retried by the retry policy)
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Wrap the futures in tqdm to create a progress bar
         future_to_url = {
-            executor.submit(download_with_retry, url, dest_path, retries): (url, dest_path)
+            executor.submit(download_with_retry, url, dest_path): (url, dest_path)
             for url, dest_path in urls_and_paths
         }
 
         futures_download(future_to_url, total_files)
 
-    # Retry failed downloads
-    if failed_files:
-        print("\nRetrying failed downloads...")
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_url = {
-                executor.submit(download_with_retry, url, dest_path, retries): (url, dest_path)
-                for url, dest_path in failed_files
-            }
-            failed_files.clear()  # Clear the list to track final failures
-
-            futures_download(future_to_url, total_files)
-
+    telemetry.finish_transfer_report(transfer_report)
     if failed_files:
         print("[WARNING] Files that failed after retries:", failed_files)
     return downloaded_files, failed_files
 
 
 def multithread_download(download_url_list, file_dest_list, progress_name, max_workers=8, **kwargs):
+    """
+    :param adaptive: Adapt the in-flight download count (starts from max_workers) to throughput, errors and latency
+     (default: concurrency.adaptive_download_enabled)
+    :param retries: Retry count of each file (backoff with jitter. Default: retry.max_retries)
+    :param priority: Priority class of the files (scheduler.PRIORITY_*) or function(url, dest_path) which returns it.
+     Files with higher priority are downloaded first (default: PRIORITY_NORMAL)
+    :param transfer_report: telemetry.TransferReport which receives the record of every file (default: a new report,
+     saved if telemetry.save_transfer_reports is enabled). The finished report of the batch is returned by
+     telemetry.get_last_transfer_report()
+    """
     support_crypto_type = ["sha1", "md5", "sha256"]
     total_files = len(download_url_list)
     download_task = {}
@@ -155,10 +686,19 @@ def multithread_download(download_url_list, file_dest_list, progress_name, max_w
     download_with_progress_bar = kwargs.get("download_with_progress_bar", False)
     no_output = kwargs.get("no_output", download_with_progress_bar)
     crypto_type = kwargs.get("crypto_type", "sha1")
+    adaptive = kwargs.get("adaptive", concurrency.adaptive_download_enabled)
+    retry_policy = retry.RetryPolicy(retries=kwargs.get("retries", None))
+    get_priority = _get_priority_function(kwargs.get("priority", scheduler.PRIORITY_NORMAL))
+    transfer_report = kwargs.get("transfer_report", None)
+    if transfer_report is None:
+        transfer_report = telemetry.TransferReport(progress_name)
 
     if crypto_type not in support_crypto_type:
         return False, f"Unsupported crypto type {crypto_type}."
 
+    max_workers, controller = _get_download_concurrency(max_workers, adaptive)
+    network.ensure_pool_size(max_workers)
+
     if with_verify_checksum:
         if not len(file_hash_list) > 0:
             return False, "file_hash_list not found."
@@ -167,33 +707,29 @@ def multithread_download(download_url_list, file_dest_list, progress_name, max_w
             file_hash_list.append(None)
 
     def download_file_with_failure_return(url, file_dest_path):
-        down_status = download_file(url, file_dest_path, no_output=no_output)
+        down_status = download_file_with_retry(url, file_dest_path, no_output=no_output, retry_policy=retry_policy,
+                                               concurrency_controller=controller,
+                                               priority=get_priority(url, file_dest_path),
+                                               transfer_report=transfer_report)
         return down_status
 
     def download_file_with_failure_return_and_verify(url, file_dest, hash):
-        down_status = download_file(url, file_dest, no_output=no_output)
-        if not down_status:
-            return False
-
-        status = verify_checksum_v2(file_dest, hash, crypto_type)
-        if not status:
-            if not no_output:
-                print(f"Warning: File {file_dest} checksum mismatch. Deleting...")
-            try:
-                os.remove(file_dest)
-            except Exception as e:
-                print(f"Error deleting file: {e}")
-            return False
-
-        return True
+        # The file is verified while it is downloading (download_file deletes it if the hash is mismatched)
+        down_status = download_file_with_retry(url, file_dest, file_hash=hash, crypto_type=crypto_type,
+                                               no_output=no_output, retry_policy=retry_policy,
+                                               concurrency_controller=controller, priority=get_priority(url, file_dest),
+                                               transfer_report=transfer_report)
+        return down_status
 
-    # Start first download attempt
+    # Start download (every file is retried by the retry policy)
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
 
         pbar_download = tqdm(total=total_files, desc=f"Downloading {progress_name}",
                              unit="file") if download_with_progress_bar else None
 
-        for file_url, file_dest, file_hash in zip(download_url_list, file_dest_list, file_hash_list):
+        download_list = sorted(zip(download_url_list, file_dest_list, file_hash_list),
+                               key=lambda download_item: get_priority(download_item[0], download_item[1]))
+        for file_url, file_dest, file_hash in download_list:
             if with_verify_checksum:
                 future = executor.submit(download_file_with_failure_return_and_verify, file_url, file_dest, file_hash)
             else:
@@ -212,34 +748,10 @@ def multithread_download(download_url_list, file_dest_list, progress_name, max_w
         if pbar_download:
             pbar_download.close()
 
-    # Retry failed downloads
+    telemetry.finish_transfer_report(transfer_report)
     if failed_files:
-        retry_failed_files = []
-        with ThreadPoolExecutor(max_workers=max_workers) as retry_executor:
-            pbar_retry = tqdm(total=len(failed_files), desc=f"Re-Downloading {progress_name}",
-                              unit="file") if download_with_progress_bar else None
-            retry_download_task = {}
-
-            for url, dst_path in failed_files:
-                future = retry_executor.submit(download_file_with_failure_return, url, dst_path
-                                               , no_output=download_with_progress_bar)
-                retry_download_task[future] = (url, dst_path)
-
-            for future in as_completed(retry_download_task):
-                url, dest_path = retry_download_task[future]
-                download_status = future.result()
-                if not download_status:
-                    retry_failed_files.append(url)
-
-                if pbar_retry:
-                    pbar_retry.update(1)
-
-            if pbar_retry:
-                pbar_retry.close()
-
-        if retry_failed_files:
-            for url in retry_failed_files:
-                print(f"Failed to download file. URL: {url}")
+        for url, _ in failed_files:
+            print(f"Failed to download file. URL: {url}")
 
     return True
 
@@ -259,9 +771,12 @@ def find_jar_file_main_class(jar_file_path):
 
 
 def check_url_status(url):
+    if not network.check_network_allowed(url, no_output=True):
+        return False
+
     try:
         # Send a HEAD request to save bandwidth
-        response = requests.head(url, allow_redirects=True, timeout=5)
+        response = network.head(url, allow_redirects=True, timeout=5)
         if response.status_code == 200:
             return True
         elif response.status_code == 404:
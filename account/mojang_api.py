@@ -1,12 +1,22 @@
 import base64
 import json
+import os
 import requests
 import logging
+from LauncherBase import Base
+from libs.Utils import network
+from libs.Utils.cache import get_cached_json, expire_cached_json
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 logging.getLogger('urllib3').setLevel(logging.INFO)
 
+mojang_api_cache_ttl = 600  # Seconds (cache for profile lookups, also used in offline mode)
+
+
+def get_mojang_api_cache_folder():
+    return os.path.join(Base.launcher_root_dir, "cache", "mojang_api")
+
 
 def get_account_uuid(username):
     """
@@ -22,14 +32,12 @@ def get_account_uuid(username):
 
     url = f"https://api.mojang.com/users/profiles/minecraft/{username}"
 
-    try:
-        response = requests.get(url)
-        data = response.json()
-
-        uuid = data.get("id", None)
-    except Exception as e:
+    data = get_cached_json(url, get_mojang_api_cache_folder(), ttl=mojang_api_cache_ttl)
+    if data is None:
         return False, None
 
+    uuid = data.get("id", None)
+
     if uuid is None:
         return False, None
 
@@ -45,10 +53,8 @@ def get_account_ign_using_uuid(uuid):
 
     url = f"https://api.minecraftservices.com/minecraft/profile/lookup/{uuid}"
 
-    try:
-        response = requests.get(url)
-        data = response.json()
-    except Exception as e:
+    data = get_cached_json(url, get_mojang_api_cache_folder(), ttl=mojang_api_cache_ttl)
+    if data is None:
         return False, None
 
     username = data.get("name", None)
@@ -68,10 +74,9 @@ def check_account_uuid_are_valid(uuid):
 
     url = f"https://api.minecraftservices.com/minecraft/profile/lookup/{uuid}"
 
-    try:
-        response = requests.get(url)
-        data = response.json()
-    except Exception as e:
+    # An unknown uuid gets an error response (get_cached_json returns None)
+    data = get_cached_json(url, get_mojang_api_cache_folder(), ttl=mojang_api_cache_ttl)
+    if data is None:
         return False
 
     username = data.get("errorMessage", None)
@@ -88,9 +93,12 @@ def check_access_token_are_valid(access_token):
     :param access_token: Minecraft account access token
     :return: Status
     """
+    if not network.check_network_allowed("https://api.minecraftservices.com/minecraft/profile"):
+        return False
+
     try:
         # Check if the current Minecraft token is valid
-        r = requests.get("https://api.minecraftservices.com/minecraft/profile", headers={
+        r = network.get("https://api.minecraftservices.com/minecraft/profile", headers={
             "Authorization": f"Bearer {access_token}"}, timeout=18)
         r.raise_for_status()
         username = r.json()["name"]
@@ -100,6 +108,35 @@ def check_access_token_are_valid(access_token):
         return False
 
 
+def get_account_textures_url(uuid):
+    return f"https://sessionserver.mojang.com/session/minecraft/profile/{uuid}"
+
+
+def invalidate_account_textures(uuid):
+    """
+    Expire the cached texture data of the account (its skin or cape is changed), the next lookup gets the new textures
+    :param uuid: Minecraft account uuid
+    """
+    expire_cached_json(get_account_textures_url(uuid), get_mojang_api_cache_folder())
+
+
+def _invalidate_account_textures_from_response(accessToken, response):
+    """
+    Invalidate the textures of the account which a skin request changed (the profile response has its uuid)
+    """
+    try:
+        uuid = response.json().get("id", None)
+    except (ValueError, AttributeError):
+        uuid = None
+
+    if uuid is None:
+        Status, _, uuid, _ = get_account_username_and_uuid(accessToken)
+        if not Status:
+            return
+
+    invalidate_account_textures(uuid)
+
+
 def get_account_textures_data(uuid):
     """
     Get Minecraft account texture data (properties>value) (json data)
@@ -107,12 +144,10 @@ def get_account_textures_data(uuid):
     :return: Status, textures_data
     """
     global account_textures_json
-    url = f"https://sessionserver.mojang.com/session/minecraft/profile/{uuid}"
+    url = get_account_textures_url(uuid)
 
-    try:
-        response = requests.get(url)
-        data = response.json()
-    except Exception as e:
+    data = get_cached_json(url, get_mojang_api_cache_folder(), ttl=mojang_api_cache_ttl)
+    if data is None:
         return False, None
 
     # Base64 data
@@ -181,9 +216,12 @@ def get_account_username_and_uuid(accessToken):
     :param uuid: Minecraft account uuid
     :return: Status, username, uuid, ErrorMessage
     """
+    if not network.check_network_allowed("https://api.minecraftservices.com/minecraft/profile"):
+        return False, None, None, network.offline_mode_error
+
     try:
         # Minecraft username and UUID
-        r = requests.get("https://api.minecraftservices.com/minecraft/profile", headers={
+        r = network.get("https://api.minecraftservices.com/minecraft/profile", headers={
             "Authorization": f"Bearer {accessToken}"}, timeout=18)
         r.raise_for_status()
         username = r.json()["name"]
@@ -196,12 +234,15 @@ def get_account_username_and_uuid(accessToken):
 def change_account_skin(accessToken, type, url):
     """
     Change Minecraft account skin using exists skin url (get from upload_account_skin)
-    Get Minecraft account data
+    The cached textures of the account are invalidated after the skin is changed
     :param accessToken: Minecraft accessToken
     :param type: Skin type (classic or slim)
     :param url: Skin texture url (using upload_account_skin to get it)
     :return: Status, ErrorMessage
     """
+    if not network.check_network_allowed("https://api.minecraftservices.com/minecraft/profile/skins"):
+        return False, network.offline_mode_error
+
     try:
         payload = {
             "variant": type,
@@ -209,10 +250,11 @@ def change_account_skin(accessToken, type, url):
         }
 
         # Minecraft username and UUID
-        r = requests.post("https://api.minecraftservices.com/minecraft/profile/skins", headers={
+        r = network.post("https://api.minecraftservices.com/minecraft/profile/skins", headers={
             "Authorization": f"Bearer {accessToken}"}, json=payload)
 
         if r.ok:
+            _invalidate_account_textures_from_response(accessToken, r)
             return True, None
 
         return False, r.json().get("errorMessage", "UnknownErr")
@@ -222,12 +264,15 @@ def change_account_skin(accessToken, type, url):
 
 def upload_account_skin(accessToken, type, file_path):
     """
-    Upload minecraft skin to mojang server
+    Upload minecraft skin to mojang server (the cached textures of the account are invalidated after it is uploaded)
     :param accessToken: Minecraft accessToken
     :param type: Skin type (classic or slim)
     :param file_path: Skin file path
     :return: Status, skin_url, ErrorMessage
     """
+    if not network.check_network_allowed("https://api.minecraftservices.com/minecraft/profile/skins"):
+        return False, None, network.offline_mode_error
+
     try:
         url = 'https://api.minecraftservices.com/minecraft/profile/skins'
 
@@ -241,13 +286,14 @@ def upload_account_skin(accessToken, type, file_path):
         }
         print(files)
 
-        response = requests.post(url, headers=headers, files=files)
+        response = network.post(url, headers=headers, files=files)
         data = response.json()
         skin_url = data.get('skins')[0].get("url")
 
         if skin_url is None:
             return False, None, "GetURLFailed"
 
+        _invalidate_account_textures_from_response(accessToken, response)
         return True, skin_url, None
 
     except Exception as e:
@@ -1,4 +1,4 @@
-import requests
+from libs.Utils import network
 
 minecraft_launcher_client_id = "00000000402B5328"
 
@@ -16,7 +16,7 @@ def get_microsoft_account_token(code, mode):
     try:
         if mode == "AuthToken":
             # Microsoft token + Microsoft refresh token
-            request_data = requests.post(oauth20_token, data={
+            request_data = network.post(oauth20_token, data={
                 "client_id": minecraft_launcher_client_id,
                 "scope": "service::user.auth.xboxlive.com::MBI_SSL",
                 "code": code,
@@ -24,7 +24,7 @@ def get_microsoft_account_token(code, mode):
                 "grant_type": "authorization_code"
             })
         elif mode == "RefreshToken":
-            request_data = requests.post("https://login.live.com/oauth20_token.srf", data={
+            request_data = network.post("https://login.live.com/oauth20_token.srf", data={
                 "client_id": minecraft_launcher_client_id,
                 "scope": "service::user.auth.xboxlive.com::MBI_SSL",
                 "refresh_token": code,
@@ -49,7 +49,7 @@ def get_xbl_token(microsoft_token):
     """
     try:
         # XBL token
-        r = requests.post("https://user.auth.xboxlive.com/user/authenticate", json={
+        r = network.post("https://user.auth.xboxlive.com/user/authenticate", json={
             "Properties": {
                 "AuthMethod": "RPS",
                 "SiteName": "user.auth.xboxlive.com",
@@ -73,7 +73,7 @@ def get_xsts_token(xbl_token):
     """
     try:
         # XSTS token
-        r = requests.post("https://xsts.auth.xboxlive.com/xsts/authorize", json={
+        r = network.post("https://xsts.auth.xboxlive.com/xsts/authorize", json={
             "Properties": {
                 "SandboxId": "RETAIL",
                 "UserTokens": [xbl_token]
@@ -98,7 +98,7 @@ def get_access_token(xsts_userhash, xsts_token):
     """
     try:
         # Minecraft token
-        r = requests.post("https://api.minecraftservices.com/authentication/login_with_xbox", json={
+        r = network.post("https://api.minecraftservices.com/authentication/login_with_xbox", json={
             "identityToken": f"XBL3.0 x={xsts_userhash};{xsts_token}"
         })
         r.raise_for_status()
@@ -3,7 +3,7 @@ The Yggdrasil system has been replaced by msa. If you want to get valid accessTo
 more information.
 """
 import json
-import requests
+from libs.Utils import network
 
 yggdrasil_auth_url = "https://authserver.mojang.com/authenticate"
 
@@ -42,7 +42,7 @@ def get_access_token_yggdrasil(username, password, **kwargs):
     }
 
     try:
-        response = requests.post(auth_url, data=json.dumps(payload), headers=headers, verify=ssl_verifying)
+        response = network.post(auth_url, data=json.dumps(payload), headers=headers, verify=ssl_verifying)
 
         response_data = response.json()
     except Exception as e:
@@ -2,15 +2,19 @@ import os
 import time
 import json
 import psutil
-import requests
+from LauncherBase import Base
+from libs.Utils import network
+from libs.Utils.cache import get_cached_json
 from libs.instance.instance import instance
 from libs.version.version import get_version_data
+from libs.version.profile import get_version_profile
 
 
 class class_argument:
     def __init__(self):
         self.BakeLibraryJVMConfigURL = ("https://github.com/Techarerm/BakeLauncher-Library/raw/refs/heads/main/JVM"
                                         "/JVM_ramConfigurations.json")
+        self.jvm_config_cache_ttl = 86400  # Seconds
 
     @staticmethod
     def write_args(instance_custom_cfg, item, data, mode, **kwargs):
@@ -39,17 +43,22 @@ class class_argument:
 
         return False, None
 
+    @staticmethod
+    def get_jvm_config_cache_folder():
+        return os.path.join(Base.launcher_root_dir, "cache", "jvm")
+
     def get_recommend_jvm_args(self, instance_custom_config):
         if not os.path.exists(instance_custom_config):
             return False, "CustomConfigNotFound"
 
         try:
             # Get recommend JVMConfig json data
-            response = requests.get(self.BakeLibraryJVMConfigURL)
+            jvm_configurations = get_cached_json(self.BakeLibraryJVMConfigURL, self.get_jvm_config_cache_folder(),
+                                                 ttl=self.jvm_config_cache_ttl)
 
-            if response.ok:
-                jvm_configurations = response.json()
-            else:
+            if jvm_configurations is None:
+                if network.is_offline_mode():
+                    return False, network.offline_mode_error
                 return False, "GrabbingJVMConfigListFailed"
 
             # Get the total memory size and convert size bytes to GB
@@ -92,23 +101,23 @@ class class_argument:
         feature_dict = {}  # Dictionary to store features with corresponding arguments
         feature_list = []  # List to store features for user selection
 
-        try:
-            # Loop through the game arguments
-            for arg in version_data['arguments']['game']:
-                if isinstance(arg, dict) and 'rules' in arg:
-                    for rule in arg['rules']:
-                        if 'features' in rule:
-                            for feature in rule['features']:
-                                if feature not in feature_dict:
-                                    feature_dict[feature] = []  # Initialize a list for the feature's arguments
-                                # Add the corresponding argument values (either string or list)
-                                if isinstance(arg['value'], list):
-                                    feature_dict[feature].extend(arg['value'])
-                                else:
-                                    feature_dict[feature].append(arg['value'])
-        except KeyError:
+        if version_data is None:
             return False, "UnsupportedVersion"
 
+        game_arguments = get_version_profile(version_data).game_arguments
+        if game_arguments is None:
+            return False, "UnsupportedVersion"
+
+        # Loop through the game arguments
+        for arg in game_arguments:
+            for rule in arg.rules:
+                if rule.features is not None:
+                    for feature in rule.features:
+                        if feature not in feature_dict:
+                            feature_dict[feature] = []  # Initialize a list for the feature's arguments
+                        # Add the corresponding argument values
+                        feature_dict[feature].extend(arg.values)
+
         # Create a list of features with numbers
         for idx, feature in enumerate(feature_dict.keys(), start=1):
             feature_list.append(f"{idx}: {feature}")
@@ -0,0 +1,75 @@
+"""
+libs/general/offline.py
+
+Cold-cache check for offline mode (find out what is missing in the local caches before going offline)
+"""
+from LauncherBase import Base
+from libs.Utils.cache import get_cached_json
+from libs.version.manifest import mojang_version_manifest_url, get_version_manifest_index
+from libs.version.version_store import load_version_data_from_store
+from libs.java.java_info import (get_java_version_manifest_data, get_support_java_version,
+                                 get_support_java_version_from_java_version_manifest,
+                                 get_support_java_runtime_version_data)
+from libs.arguments.arguments import arguments
+
+
+def check_offline_cache(version_ids, **kwargs):
+    """
+    Check the local caches contain everything which the versions need in offline mode (no request will be sent)
+    :param version_ids: Minecraft version id list
+    ***Other parameters***
+    :param custom_version_manifest_url: Custom version manifest URL
+    :param platform_name: Platform name of the java runtime (default: Base.Platform)
+    :param full_arch: Architecture of the java runtime (default: Base.FullArch)
+    :param check_java_runtime: Check java manifest and java runtime manifests (default: True)
+    :param check_jvm_config: Check recommend JVM config (default: True)
+    :return: Status (True if nothing is missing), missing item list
+    """
+    # parameter stuff
+    version_manifest_url = kwargs.get("custom_version_manifest_url", mojang_version_manifest_url)
+    platform_name = kwargs.get("platform_name", Base.Platform)
+    full_arch = kwargs.get("full_arch", Base.FullArch)
+    check_java_runtime = kwargs.get("check_java_runtime", True)
+    check_jvm_config = kwargs.get("check_jvm_config", True)
+
+    missing_items = []
+    java_major_versions = []
+
+    manifest = get_version_manifest_index(version_manifest_url, cache_only=True)
+    if manifest is None:
+        missing_items.append(f"VersionManifest:{version_manifest_url}")
+    else:
+        for version_id in version_ids:
+            version_url, version_sha1 = manifest.get_url_and_sha1(version_id)
+            if version_url is None:
+                missing_items.append(f"UnknownVersion:{version_id}")
+                continue
+
+            version_data = load_version_data_from_store(version_sha1) if version_sha1 is not None else None
+            if version_data is None:
+                missing_items.append(f"VersionData:{version_id}")
+                continue
+
+            Status, component, major_version = get_support_java_version(version_data)
+            if Status and major_version not in java_major_versions:
+                java_major_versions.append(major_version)
+
+    if check_java_runtime:
+        if get_java_version_manifest_data(cache_only=True) is None:
+            missing_items.append("JavaManifest")
+        else:
+            organized_manifest_data_list = get_support_java_version_from_java_version_manifest(
+                platform_name, full_arch, cache_only=True)
+            for major_version in java_major_versions:
+                Status, _ = get_support_java_runtime_version_data(organized_manifest_data_list, major_version,
+                                                                  cache_only=True)
+                if not Status:
+                    missing_items.append(f"JavaRuntimeManifest:{major_version}")
+
+    if check_jvm_config:
+        jvm_configurations = get_cached_json(arguments.BakeLibraryJVMConfigURL,
+                                             arguments.get_jvm_config_cache_folder(), cache_only=True)
+        if jvm_configurations is None:
+            missing_items.append("JVMConfig")
+
+    return len(missing_items) == 0, missing_items
@@ -1,10 +1,10 @@
 import os
 import json
 import textwrap
-import requests
 from datetime import datetime
 from LauncherBase import Base
 from libs.version.version import get_version_data
+from libs.version.manifest import get_version_manifest_index, get_unified_version_manifest_index
 from libs.definition.data import *
 
 
@@ -100,18 +100,15 @@ class class_instance:
             ini_file.write(instance_info)
 
     def get_instance_type(self, minecraft_version):
-        response = requests.get(self.VersionManifestURl)
-        data = response.json()
-
-        # Search for the specific version
-        version_info = next((v for v in data['versions'] if v['id'] == minecraft_version), None)
-
-        # Display the type if found
-        if version_info:
-            return version_info['type']
+        if self.use_legacy_manifest:
+            manifest = get_unified_version_manifest_index(custom_version_manifest_url=self.VersionManifestURl)
         else:
+            manifest = get_version_manifest_index(self.VersionManifestURl)
+        if manifest is None:
             return None
 
+        return manifest.get_type(minecraft_version)
+
     @staticmethod
     def create_custom_config(config_file_path, **kwargs):
         overwrite = kwargs.get("overwrite", False)
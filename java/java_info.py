@@ -2,10 +2,16 @@ import json
 import os.path
 import textwrap
 
-import requests
+from LauncherBase import Base
+from libs.Utils.cache import get_cached_json
 
 azul_packages_api = "https://api.azul.com/metadata/v1/zulu/packages"
 java_manifest_url = 'https://launchermeta.mojang.com/v1/products/java-runtime/2ec0cc96c44e5a76b9c8b7c39df7210883d12871/all.json'
+java_cache_ttl = 3600  # Seconds
+
+
+def get_java_cache_folder():
+    return os.path.join(Base.launcher_root_dir, "cache", "java")
 
 
 def get_java_build_download_url_from_azul(platform_name: str, full_arch: str, java_major_version: str):
@@ -46,8 +52,9 @@ def get_java_build_download_url_from_azul(platform_name: str, full_arch: str, ja
     version_url_list = [full_jre_url, full_jdk_url]
     for url, ver_type in zip(version_url_list, version_type_list):
         try:
-            response = requests.get(url)
-            data = response.json()
+            data = get_cached_json(url, get_java_cache_folder(), ttl=java_cache_ttl)
+            if data is None:
+                return False, None, None
             java_ver_data = data[0]
             download_url = java_ver_data.get("download_url", None)
 
@@ -57,17 +64,10 @@ def get_java_build_download_url_from_azul(platform_name: str, full_arch: str, ja
             return False, None, None
 
 
-def get_java_version_manifest_data():
-    # Get java manifest
-    try:
-        response = requests.get(java_manifest_url)
-        if response.status_code == 200:
-            manifest_data = response.json()
-            return manifest_data
-        else:
-            return None
-    except Exception as e:
-        return None
+def get_java_version_manifest_data(**kwargs):
+    # Get java manifest (None if unavailable. cache_only=True never send a request)
+    cache_only = kwargs.get("cache_only", False)
+    return get_cached_json(java_manifest_url, get_java_cache_folder(), ttl=java_cache_ttl, cache_only=cache_only)
 
 
 def get_support_java_version(version_data):
@@ -84,10 +84,12 @@ def get_support_java_version(version_data):
         return False, None, None
 
 
-def get_support_java_version_from_java_version_manifest(platform, full_arch):
+def get_support_java_version_from_java_version_manifest(platform, full_arch, **kwargs):
     """
+    :param cache_only: Only use the cached java manifest (never send a request)
     :return SupportList
     """
+    cache_only = kwargs.get("cache_only", False)
 
     platform_map = {
         "darwin": "mac-os",
@@ -107,12 +109,10 @@ def get_support_java_version_from_java_version_manifest(platform, full_arch):
 
     architecture_list = architecture_map.get(full_arch.lower(), full_arch.lower())
 
-    try:
-        response = requests.get(java_manifest_url)
-    except Exception as e:
+    java_manifest_data = get_java_version_manifest_data(cache_only=cache_only)
+    if java_manifest_data is None:
         return False, None
 
-    java_manifest_data = response.json()
     java_manifest_data_cleaned = {}
     organized_manifest_data_list = []
 
@@ -162,10 +162,12 @@ def get_support_java_version_from_java_version_manifest(platform, full_arch):
     return organized_manifest_data_list
 
 
-def get_support_java_runtime_version_data(organized_manifest_data_list, major_version):
+def get_support_java_runtime_version_data(organized_manifest_data_list, major_version, **kwargs):
     """
     Warning: Require organized_manifest_data_list
+    :param cache_only: Only use the cached runtime manifest (never send a request)
     """
+    cache_only = kwargs.get("cache_only", False)
     java_version_url = None
 
     for data in organized_manifest_data_list:
@@ -179,14 +181,12 @@ def get_support_java_runtime_version_data(organized_manifest_data_list, major_ve
                 java_version_url = url
 
     if java_version_url is not None:
-        try:
-            response = requests.get(java_version_url)
-            data = response.json()
-
-            return True, data
-        except Exception as e:
+        data = get_cached_json(java_version_url, get_java_cache_folder(), ttl=java_cache_ttl, cache_only=cache_only)
+        if data is None:
             return False, None
 
+        return True, data
+
     return False, None
 
 
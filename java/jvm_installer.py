@@ -1,7 +1,16 @@
+import json
 import shutil
 
 from libs.Utils.utils import *
 from libs.java.java_info import *
+from libs.Utils.scheduler import PRIORITY_BULK
+from libs.Utils import telemetry
+
+use_lzma_downloads = True  # Download the LZMA variant of runtime files if the manifest has it
+runtime_download_workers = 8  # Concurrent file downloads of a java runtime install
+# Installed state of a runtime (path, sha1 and size of every installed entry). Updates only touch the entries which
+# are added, changed or removed in the new manifest
+runtime_state_file_name = "runtime.state.json"
 
 class class_jvm_installer:
 
@@ -12,58 +21,288 @@ class class_jvm_installer:
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-    def download_java_file(self, file_info, file_path, destination_folder):
-        download_type = "raw"  # You can choose "lzma" if preferred
+    def download_java_file(self, file_info, file_path, destination_folder, **kwargs):
+        """
+        :param create_directories: Create the directory of the file (default: True)
+        :param check_existing: Skip the download if the existing file matches its sha1 (default: True)
+        :param transfer_report: telemetry.TransferReport which receives the record of the download
+        :return: Status
+        """
+        transfer_report = kwargs.get("transfer_report", None)
+        # The LZMA variant is decompressed while it is downloading and verified against the sha1 of the raw file
+        download_type = "lzma" if use_lzma_downloads and "lzma" in file_info["downloads"] else "raw"
         file_url = file_info["downloads"][download_type]["url"]
         file_name = os.path.basename(file_path)  # Extract the file name
         full_file_path = os.path.join(destination_folder, file_path)
-        expected_sha1 = file_info["downloads"][download_type]["sha1"]
+        expected_sha1 = file_info["downloads"]["raw"]["sha1"]
 
         # Create necessary directories
-        self.create_directories(file_path, destination_folder)
+        if kwargs.get("create_directories", True):
+            self.create_directories(file_path, destination_folder)
 
-        # Check if the file already exists and verify checksum
-        if os.path.exists(full_file_path) and verify_checksum(full_file_path, expected_sha1):
-            return
+        # Check if the file already exists and verify checksum (skipped if the file is known to be outdated)
+        if kwargs.get("check_existing", True) and os.path.exists(full_file_path) \
+                and verify_checksum(full_file_path, expected_sha1):
+            return True
+
+        # Download file (linked from the file store if it is stored, mirrors are used if they are registered and the
+        # file is verified while it is downloading)
+        failure_info = {}
+        Status = download_file_with_retry(file_url, full_file_path, sha1=expected_sha1, no_output=True,
+                                          failure_info=failure_info, priority=PRIORITY_BULK,
+                                          decompress="lzma" if download_type == "lzma" else None,
+                                          transfer_report=transfer_report)
+        if not Status and download_type == "lzma" and failure_info.get("reason", None) in ("LZMAError",
+                                                                                           "ChecksumMismatch"):
+            # The compressed file is broken, download the raw file instead
+            print(f"[DEBUG] Failed to decompress {file_name}. Downloading the raw file...")
+            failure_info = {}
+            Status = download_file_with_retry(file_info["downloads"]["raw"]["url"], full_file_path, sha1=expected_sha1,
+                                              no_output=True, failure_info=failure_info, priority=PRIORITY_BULK,
+                                              transfer_report=transfer_report)
 
-        # Download file
-        response = requests.get(file_url)
-        if response.status_code == 200:
-            with open(full_file_path, "wb") as f:
-                f.write(response.content)
-            if Base.UsingLegacyDownloadOutput:
-                if verify_checksum(full_file_path, expected_sha1):
-                    print(f"Downloaded and verified {file_name} to {full_file_path}", color='green')
-            if not verify_checksum(full_file_path, expected_sha1):
+        if not Status:
+            if failure_info.get("reason", None) == "ChecksumMismatch":
                 print(f"Checksum mismatch for {file_name}.", color='yellow')
+            else:
+                print(f"Failed to download {file_name}. Status code: {failure_info.get('status_code', None)}")
+            return False
+
+        if Base.UsingLegacyDownloadOutput:
+            print(f"Downloaded and verified {file_name} to {full_file_path}", color='green')
+        return True
+
+    @staticmethod
+    def get_java_runtime_download_list(manifest, install_path):
+        """
+        Select the files of a java runtime manifest which need to be downloaded (raw downloads)
+        :return: [(file_path, url, dest_path, sha1, size)]
+        """
+        download_list = []
+        for file_path, file_info in manifest.get("files", {}).items():
+            if "downloads" not in file_info:
+                continue
+
+            raw_info = file_info["downloads"]["raw"]
+            download_list.append((file_path, raw_info["url"], os.path.join(install_path, file_path),
+                                  raw_info.get("sha1", None), raw_info.get("size", None)))
+        return download_list
+
+    @staticmethod
+    def set_java_runtime_entry(file_path, file_info, install_path):
+        """
+        Apply a link entry (create the symlink) or the executable flag of a file entry of a java runtime manifest
+        """
+        full_file_path = os.path.join(install_path, file_path)
+        if file_info.get("type", None) == "link":
+            target = file_info.get("target", None)
+            if target is None:
+                return
+            if os.path.lexists(full_file_path):
+                if os.path.islink(full_file_path) and os.readlink(full_file_path) == target:
+                    return
+                # Outdated link or a file which is a link in the new manifest
                 os.remove(full_file_path)
-        else:
-            print(f"Failed to download {file_name}. Status code: {response.status_code}")
+            try:
+                os.symlink(target, full_file_path)
+            except OSError as e:
+                # Windows without symlink permission (runtimes of Windows don't have links)
+                print(f"[DEBUG] Unable to create link {full_file_path} -> {target}. ERR:{e}")
+            return
+
+        if file_info.get("executable", False) and not Base.Platform == "Windows" and os.path.exists(full_file_path):
+            file_stat = os.stat(full_file_path)
+            if file_stat.st_mode & 0o111 != 0o111:
+                if file_stat.st_nlink > 1:
+                    # Hard link of the file store (or another runtime), the mode belongs to the shared inode
+                    tmp_file_path = f"{full_file_path}.tmp"
+                    shutil.copyfile(full_file_path, tmp_file_path)
+                    os.replace(tmp_file_path, full_file_path)
+                os.chmod(full_file_path, file_stat.st_mode | 0o111)
+
+    @staticmethod
+    def load_java_runtime_state(install_path):
+        """
+        :return: {file_path: entry} (no state or broken state return None)
+        """
+        state_path = os.path.join(install_path, runtime_state_file_name)
+        if not os.path.exists(state_path):
+            return None
+
+        try:
+            with open(state_path, "r") as f:
+                return json.load(f).get("files", {})
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[DEBUG] Unable to read java runtime state {state_path}. ERR:{e}")
+            return None
+
+    @staticmethod
+    def save_java_runtime_state(install_path, manifest, failed_files=()):
+        """
+        Save the installed state of a runtime (failed files aren't saved, so they are downloaded again next time)
+        """
+        state = {}
+        for file_path, file_info in manifest.get("files", {}).items():
+            if file_path in failed_files:
+                continue
 
-    def download_java_runtime_files(self, manifest, install_path):
+            entry_type = file_info.get("type", "file")
+            if entry_type == "file" and "downloads" in file_info:
+                raw_info = file_info["downloads"]["raw"]
+                state[file_path] = {"type": "file", "sha1": raw_info.get("sha1", None),
+                                    "size": raw_info.get("size", None),
+                                    "executable": file_info.get("executable", False)}
+            elif entry_type == "link":
+                state[file_path] = {"type": "link", "target": file_info.get("target", None)}
+            elif entry_type == "directory":
+                state[file_path] = {"type": "directory"}
+
+        state_path = os.path.join(install_path, runtime_state_file_name)
+        tmp_state_path = f"{state_path}.tmp"
+        try:
+            with open(tmp_state_path, "w") as f:
+                json.dump({"files": state}, f)
+            os.replace(tmp_state_path, state_path)
+        except OSError as e:
+            print(f"[DEBUG] Unable to save java runtime state {state_path}. ERR:{e}")
+
+    @staticmethod
+    def diff_java_runtime_state(state, manifest, install_path):
+        """
+        Compare the installed state with a runtime manifest (files are checked by size, they aren't hashed)
+        :return: added_files, changed_files, unchanged_files, removed_paths (added/changed/unchanged: {file_path:
+         file_info})
+        """
+        added_files = {}
+        changed_files = {}
+        unchanged_files = {}
+        manifest_files = manifest.get("files", {})
+
+        for file_path, file_info in manifest_files.items():
+            if "downloads" not in file_info:
+                continue
+
+            raw_info = file_info["downloads"]["raw"]
+            entry = state.get(file_path, None)
+            if entry is None or entry.get("type", None) != "file":
+                added_files[file_path] = file_info
+                continue
+
+            full_file_path = os.path.join(install_path, file_path)
+            if entry.get("sha1", None) == raw_info.get("sha1", None) and os.path.isfile(full_file_path) \
+                    and os.path.getsize(full_file_path) == raw_info.get("size", None):
+                unchanged_files[file_path] = file_info
+            else:
+                changed_files[file_path] = file_info
+
+        removed_paths = [file_path for file_path in state if file_path not in manifest_files]
+        return added_files, changed_files, unchanged_files, removed_paths
+
+    @staticmethod
+    def remove_java_runtime_entries(install_path, removed_paths, state):
+        """
+        Remove the entries which aren't in the new manifest (directories are only removed if they are empty)
+        """
+        # Deepest paths first, so the files of a directory are removed before the directory
+        for file_path in sorted(removed_paths, key=lambda path: path.count("/"), reverse=True):
+            full_file_path = os.path.join(install_path, file_path)
+            try:
+                if state[file_path].get("type", None) == "directory":
+                    if os.path.isdir(full_file_path) and not os.listdir(full_file_path):
+                        os.rmdir(full_file_path)
+                elif os.path.lexists(full_file_path):
+                    os.remove(full_file_path)
+            except OSError as e:
+                print(f"[DEBUG] Unable to remove {full_file_path}. ERR:{e}")
+
+    def download_java_runtime_files(self, manifest, install_path, **kwargs):
+        """
+        Install the files of a java runtime manifest (directories are created first, files are downloaded concurrently,
+        links and executable flags are applied after the files)
+        A runtime which has an installed state (runtime_state_file_name) is updated incrementally: only added and changed
+        files are downloaded, removed entries are deleted and unchanged files aren't hashed again.
+        :param install_plan: InstallPlan which has the runtime files (create_install_plan). Only the files which the
+         plan has to fetch are downloaded (valid files aren't checked again. The installed state is used instead if
+         the runtime has it)
+        :param max_workers: Max concurrent file downloads (default: runtime_download_workers)
+        :param failed_files: A list which receives the paths (in the runtime) of the files which failed to download
+        :param transfer_report: telemetry.TransferReport which receives the record of every downloaded file (the finished
+         report is returned by telemetry.get_last_transfer_report())
+        """
+        install_plan = kwargs.get("install_plan", None)
+        max_workers = kwargs.get("max_workers", runtime_download_workers)
+        failed_file_list = kwargs.get("failed_files", None)
         if not os.path.exists(install_path):
             return False, "InstallFolderAreNotExist"
 
-        files = manifest.get("files", {})
+        transfer_report = kwargs.get("transfer_report", None)
+        if transfer_report is None:
+            transfer_report = telemetry.TransferReport("java-runtime")
+
+        entries = manifest.get("files", {})
+
+        # Create every directory once (file entries can come before their directory entry)
+        directories = set()
+        for file_path, file_info in entries.items():
+            if file_info.get("type", None) == "directory":
+                directories.add(os.path.join(install_path, file_path))
+            else:
+                directories.add(os.path.dirname(os.path.join(install_path, file_path)))
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+
+        files = {file_path: file_info for file_path, file_info in entries.items() if "downloads" in file_info}
+        outdated_file_paths = set()
+        state = self.load_java_runtime_state(install_path)
+        if state is not None:
+            added_files, changed_files, unchanged_files, removed_paths = self.diff_java_runtime_state(
+                state, manifest, install_path)
+            self.remove_java_runtime_entries(install_path, removed_paths, state)
+            files = dict(added_files, **changed_files)
+            # Changed files with a different sha1 in the state are outdated, they don't need to be hashed
+            outdated_file_paths = set(file_path for file_path in changed_files
+                                      if state[file_path].get("sha1", None) !=
+                                      changed_files[file_path]["downloads"]["raw"].get("sha1", None))
+            print(f"[DEBUG] Java runtime update: {len(added_files)} added, {len(changed_files)} changed, "
+                  f"{len(removed_paths)} removed, {len(unchanged_files)} unchanged.")
+        elif install_plan is not None:
+            fetch_file_paths = set(planned_file.name for planned_file
+                                   in install_plan.get_files("java_runtime", only_missing=True))
+            files = {file_path: file_info for file_path, file_info in files.items() if file_path in fetch_file_paths}
         total_files = len(files)  # Get total number of files to download(for progress bar)
 
-        # Create a progress bar with a custom color
-        if not Base.UsingLegacyDownloadOutput:
-            with tqdm(total=total_files, unit="file", desc="Downloading files", colour='cyan') as progress_bar:
-                for file_path, file_info in files.items():
-                    if "downloads" in file_info:
-                        # Test method
-                        self.download_java_file(file_info, file_path, install_path)
-                        progress_bar.update(1)  # Increment progress bar for each completed file
-
-                # Ensure the progress bar completes at 100%(??? Why it stuck in 92%???)
-                progress_bar.n = total_files
-                progress_bar.refresh()
-        else:
-            files = manifest.get("files", {})
-            for file_path, file_info in files.items():
-                if "downloads" in file_info:
-                    self.download_java_file(file_info, file_path, install_path)
+        failed_files = []
+        network.ensure_pool_size(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_path = {
+                executor.submit(self.download_java_file, file_info, file_path, install_path, create_directories=False,
+                                check_existing=file_path not in outdated_file_paths,
+                                transfer_report=transfer_report): file_path
+                for file_path, file_info in files.items()
+            }
+
+            # Create a progress bar with a custom color
+            progress_bar = tqdm(total=total_files, unit="file", desc="Downloading files",
+                                colour='cyan') if not Base.UsingLegacyDownloadOutput else None
+            for future in as_completed(future_to_path):
+                if not future.result():
+                    failed_files.append(future_to_path[future])
+                if progress_bar:
+                    progress_bar.update(1)  # Increment progress bar for each completed file
+            if progress_bar:
+                progress_bar.close()
+
+        for file_path, file_info in entries.items():
+            self.set_java_runtime_entry(file_path, file_info, install_path)
+
+        self.save_java_runtime_state(install_path, manifest, set(failed_files))
+        telemetry.finish_transfer_report(transfer_report)
+        if failed_file_list is not None:
+            failed_file_list.extend(failed_files)
+
+        if failed_files:
+            print(f"[WARNING] Failed to download {len(failed_files)} java runtime files: {failed_files}")
+            return False, "DownloadFailed"
 
         return True, "DownloadFinished"
 
@@ -89,7 +328,11 @@ class class_jvm_installer:
             except Exception as e:
                 return False, "Cannot delete unzip tmp file."
 
-        Status = download_file(download_url, jvm_zip_file_path)
+        # JVM archives are large, they are downloaded in segments if the server supports range requests
+        transfer_report = telemetry.TransferReport(f"jvm-azul-{java_major_version}")
+        Status = download_file_with_retry(download_url, jvm_zip_file_path, priority=PRIORITY_BULK, segmented=True,
+                                          transfer_report=transfer_report)
+        telemetry.finish_transfer_report(transfer_report)
 
         if not Status:
             return False, "Download file failed."
@@ -2,7 +2,13 @@ import os
 import re
 from itertools import cycle
 from LauncherBase import Base
+from libs.Utils import telemetry
 from libs.Utils.utils import download_file, multi_thread_download, multithread_download
+from libs.Utils.async_download import async_download
+from libs.Utils.crypto import verify_existing_file
+from libs.Utils.scheduler import PRIORITY_CRITICAL, get_library_priority
+from libs.version.inheritance import resolve_version_data
+from libs.version.profile import get_version_profile
 from libs.platform.platfrom import *
 
 
@@ -114,6 +120,7 @@ def generate_classpath(client_version, libraries_dir, **kwargs):
      without_client_jar > return classpath without client jar path
      custom_main_class_path > replace client jar path to custom main class path
      extra_classpath > append extra class paths to classpath
+     custom_version_data > build classpath from the (parsed) version data libraries instead of searching libraries_dir
     """
     client_jar_path = None
     jar_paths_string = ""
@@ -130,20 +137,36 @@ def generate_classpath(client_version, libraries_dir, **kwargs):
     without_client_jar = kwargs.get("without_client_jar", False)
     main_class_path = kwargs.get("custom_main_class_path", None)
     extra_classpath = kwargs.get("extra_classpath", None)
-
-    for root, dirs, files in os.walk(libraries_dir):
-        for file in files:
-            if file.endswith('.jar') and not file.startswith("client.jar"):
-                # Skip adding client.jar to jar_paths_string
-                relative_path = os.path.relpath(os.path.join(root, file), start=libraries_dir)
-                full_path = os.path.join("libraries", relative_path)
-
-                # Append the path to the jar_paths_string with the correct separator
-                if Base.Platform == "Windows":
-                    jar_paths_string += full_path + classpath_separator
-                else:
-                    jar_paths_string += full_path + classpath_separator
+    version_data = kwargs.get("custom_version_data", None)
+
+    if version_data is not None:
+        # Same libraries as download_libraries + download_natives (only the downloaded files)
+        version_data = resolve_version_data(version_data)
+        lib_paths = [lib.artifact.path for lib in get_version_profile(version_data).libraries
+                     if not lib.rules and lib.artifact and lib.artifact.path is not None]
+        natives_lib_paths = download_natives(version_data, libraries_dir, only_return_lib_paths=True)
+        if isinstance(natives_lib_paths, list):
+            lib_paths += natives_lib_paths
+
+        for lib_path in dict.fromkeys(lib_paths):
+            if lib_path.endswith('.jar') and os.path.exists(os.path.join(libraries_dir, lib_path)):
+                full_path = os.path.join("libraries", os.path.normpath(lib_path))
+                jar_paths_string += full_path + classpath_separator
                 libraries_path_list.append(full_path)
+    else:
+        for root, dirs, files in os.walk(libraries_dir):
+            for file in files:
+                if file.endswith('.jar') and not file.startswith("client.jar"):
+                    # Skip adding client.jar to jar_paths_string
+                    relative_path = os.path.relpath(os.path.join(root, file), start=libraries_dir)
+                    full_path = os.path.join("libraries", relative_path)
+
+                    # Append the path to the jar_paths_string with the correct separator
+                    if Base.Platform == "Windows":
+                        jar_paths_string += full_path + classpath_separator
+                    else:
+                        jar_paths_string += full_path + classpath_separator
+                    libraries_path_list.append(full_path)
 
     # Finally, append the client.jar path to the end of the jar paths string if it exists
     if not without_client_jar:
@@ -215,87 +238,112 @@ def convert_library_name_to_artifact_path(library_path, **kwargs):
         return False, None
 
 
-def download_libraries(version_data, libraries_dir, **kwargs):
+def get_library_download_list(version_data, libraries_dir):
     """
-    Download require libraries (from version data)
+    Select the libraries (without natives) of version data
+    :param version_data: Resolved version data (or VersionProfile)
+    :return: [(lib_path, url, dest_path, sha1, size)]
     """
-    library_are_native = False
-    # Some parameter stuff
-    normal_download = kwargs.get("normal_download", False)
-    bypass_download_natives = kwargs.get("bypass_download_natives", False)
-    name = "libraries"
-    # Confirm libraries_dir are created
-    os.makedirs(libraries_dir, exist_ok=True)
-
-    # Waiting-Download-List
-    multi_download_queue = []
-    normal_download_url_list = []
-    normal_download_path_list = []
-
-    # Get libraries data from version_data
-    libraries = version_data.get('libraries', [])
+    download_list = []
 
     # Search support user platform libraries
-    for lib in libraries:
-        lib_downloads = lib.get('downloads', {})
-        artifact = lib_downloads.get('artifact')
+    for lib in get_version_profile(version_data).libraries:
+        artifact = lib.artifact
 
-        rules = lib.get('rules', None)
-        if rules:
+        if lib.rules:
             # Bypass download native
             continue
 
         if artifact:
-            lib_path = artifact.get('path', None)
+            lib_path = artifact.path
             if lib_path is None:
                 continue
 
-            lib_url = artifact.get('url', None)
+            lib_url = artifact.url
             if lib_url is None:
                 continue
 
             lib_dest = os.path.join(libraries_dir, lib_path)
-            os.makedirs(os.path.dirname(lib_dest), exist_ok=True)
+            download_list.append((lib_path, lib_url, lib_dest, artifact.sha1, artifact.size))
+
+    return download_list
+
+
+def download_libraries(version_data, libraries_dir, **kwargs):
+    """
+    Download require libraries (from version data)
+    :param use_async_download: Download with the asyncio download engine (async_download) instead of threads
+    :param transfer_report: telemetry.TransferReport which receives the record of every downloaded file (the finished
+     report is returned by telemetry.get_last_transfer_report())
+    :param install_plan: InstallPlan of the version (create_install_plan). The libraries in the plan are downloaded
+     instead of selecting (and checking) them again
+    """
+    library_are_native = False
+    # Some parameter stuff
+    normal_download = kwargs.get("normal_download", False)
+    bypass_download_natives = kwargs.get("bypass_download_natives", False)
+    use_async_download = kwargs.get("use_async_download", False)
+    install_plan = kwargs.get("install_plan", None)
+    name = "libraries"
+    transfer_report = kwargs.get("transfer_report", None)
+    if transfer_report is None:
+        transfer_report = telemetry.TransferReport(name)
 
+    # Confirm libraries_dir are created
+    os.makedirs(libraries_dir, exist_ok=True)
+
+    # Waiting-Download-List
+    download_list = []
+    valid_library_count = 0
+
+    if install_plan is not None:
+        for planned_file in install_plan.get_files("libraries"):
+            if planned_file.valid:
+                valid_library_count += 1
+            else:
+                download_list.append((planned_file.url, planned_file.dest_path, planned_file.sha1))
+    else:
+        # Mod-loader profiles (inheritsFrom) need to be merged with their parent first
+        version_data = resolve_version_data(version_data)
+        if version_data is None:
+            return False
+
+        for lib_path, lib_url, lib_dest, sha1, size in get_library_download_list(version_data, libraries_dir):
             if library_are_native and bypass_download_natives:
                 continue
 
-            if normal_download:
-                normal_download_url_list.append(lib_url)
-                normal_download_path_list.append(lib_dest)
-            else:
-                lib_url_and_dest = [
-                    (lib_url, lib_dest)
-                ]
-                multi_download_queue.append(lib_url_and_dest)
+            # Skip libraries which already exist and match their size and sha1
+            if verify_existing_file(lib_dest, sha1, size):
+                valid_library_count += 1
+                continue
+
+            download_list.append((lib_url, lib_dest, sha1))
 
     if normal_download:
-        for url, dest_path in zip(normal_download_url_list, normal_download_path_list):
-            download_file(url, dest_path)
+        for url, dest_path, sha1 in download_list:
+            download_file(url, dest_path, sha1=sha1)
+        telemetry.finish_transfer_report(transfer_report)
+    elif use_async_download:
+        async_download(download_list, name, priority=get_library_priority, transfer_report=transfer_report)
+    elif len(download_list) > 0:
+        multi_thread_download([[item] for item in download_list], name, priority=get_library_priority,
+                              transfer_report=transfer_report)
     else:
-        multi_thread_download(multi_download_queue, name)
+        # Nothing to download, the (empty) report of this call is still the last report
+        telemetry.finish_transfer_report(transfer_report)
 
-    if len(multi_download_queue) > 0:
+    if len(download_list) > 0 or valid_library_count > 0:
         return True
     else:
         return False
 
 
-def download_natives(version_data, libraries_dir, platform_name=Base.Platform, full_arch=Base.FullArch, **kwargs):
+def get_natives_download_list(version_data, libraries_dir, platform_name=Base.Platform, full_arch=Base.FullArch):
     """
-    Download natives from version data
-    :param version_data: Minecraft version data (JSON)
-    :param libraries_dir: libraries folder (The path which library(natives) download to)
-    :param unzip_natives_folder: The folder which natives unzip to
-    :param platform_name: System (Platform) name (Example: Windows, macOS, Linux)
-    :param full_arch: Platform Architecture (Support list: amd64(full support), arm64(not full support),
-     i386(not full support. Drop support in the new version)
+    Select the natives of version data which support the platform
+    :param version_data: Resolved version data (or VersionProfile)
+    :return: Status, [(lib_path, url, dest_path, sha1, size)] (failed return False, error)
     """
-    # parameter stuff
-    only_return_lib_paths = kwargs.get("only_return_lib_paths", False)
-    lib_paths = []
-
-    global natives_key_list, native_keys_list
 
     platform_name = platform_name.lower()
     full_arch = full_arch.lower()
@@ -353,29 +401,26 @@ def download_natives(version_data, libraries_dir, platform_name=Base.Platform, f
     else:
         native_keys_list = []
 
-    download_queue = []
-    libraries_data = version_data.get('libraries', [])
+    download_list = []
+    libraries_data = get_version_profile(version_data).libraries
 
     # Processing normal natives
     for lib in libraries_data:
-        lib_name = lib.get("name", None)
+        lib_name = lib.name
         # print(f"Checking lib {lib_name}...")
-        lib_downloads = lib.get('downloads', {})
 
         # Check platform compatibility via rules
-        rules = lib.get('rules', [])
+        rules = lib.rules
 
         # Process only normal natives (without "classifiers" key)
-        classifiers = lib_downloads.get("classifiers", None)
+        classifiers = lib.classifiers
         if rules and classifiers is None:
-            allow = rules[0]["action"] if rules and "action" in rules[0] else None
-            allow_platform = [rules[0]["os"]["name"]] if rules and "os" in rules[0] and "name" in rules[0]["os"] else []
-            disallow_platform = rules[1]["os"]["name"] if len(rules) > 1 and "os" in rules[1] and "name" in rules[1][
-                "os"] else []
-            artifact = lib_downloads.get('artifact', {})
-            lib_path = artifact.get("path", None)
-            natives = lib.get("natives", {})
-            support_platform_list = list(natives.values())
+            allow = rules[0].action
+            allow_platform = [rules[0].os_name] if rules[0].os_name is not None else []
+            disallow_platform = rules[1].os_name if len(rules) > 1 and rules[1].os_name is not None else []
+            artifact = lib.artifact
+            lib_path = artifact.path if artifact is not None else None
+            support_platform_list = list(lib.natives.values())
 
             allowed_download = False
             for native_key in native_keys_list:
@@ -402,19 +447,14 @@ def download_natives(version_data, libraries_dir, platform_name=Base.Platform, f
                     break
 
             if allowed_download:
-                lib_url = artifact.get("url", None)
+                lib_url = artifact.url if artifact is not None else None
 
                 if lib_path is None or lib_url is None:
                     # print(f"Skipping library {lib_name}")
                     continue
                 # print(f"Library {lib_name} added!", color='lightgreen')
                 lib_dest = os.path.join(libraries_dir, lib_path)
-                os.makedirs(os.path.dirname(lib_dest), exist_ok=True)
-                natives_url_and_dest = [
-                    (lib_url, lib_dest)
-                ]
-                download_queue.append(natives_url_and_dest)
-                lib_paths.append(lib_path)
+                download_list.append((lib_path, lib_url, lib_dest, artifact.sha1, artifact.size))
 
         # Process classifiers if available
         if classifiers:
@@ -422,8 +462,8 @@ def download_natives(version_data, libraries_dir, platform_name=Base.Platform, f
                 if native_key in classifiers:
                     print(f"Found match native key in the lib {lib_name}", color='blue')
                     classifier_info = classifiers[native_key]
-                    lib_path = classifier_info.get("path")
-                    lib_url = classifier_info.get("url")
+                    lib_path = classifier_info.path
+                    lib_url = classifier_info.url
 
                     if not lib_path or not lib_url:
                         print(f"Skipping library {lib_name}")
@@ -431,19 +471,77 @@ def download_natives(version_data, libraries_dir, platform_name=Base.Platform, f
 
                     # print(f"Library {lib_name} added!", color='lightgreen')
                     lib_dest = os.path.join(libraries_dir, lib_path)
-                    os.makedirs(os.path.dirname(lib_dest), exist_ok=True)
-                    natives_url_and_dest = [
-                        (lib_url, lib_dest)
-                    ]
-                    download_queue.append(natives_url_and_dest)
-                    lib_paths.append(lib_path)
+                    download_list.append((lib_path, lib_url, lib_dest, classifier_info.sha1, classifier_info.size))
+
+    return True, download_list
+
+
+def download_natives(version_data, libraries_dir, platform_name=Base.Platform, full_arch=Base.FullArch, **kwargs):
+    """
+    Download natives from version data
+    :param version_data: Minecraft version data (JSON)
+    :param libraries_dir: libraries folder (The path which library(natives) download to)
+    :param unzip_natives_folder: The folder which natives unzip to
+    :param platform_name: System (Platform) name (Example: Windows, macOS, Linux)
+    :param full_arch: Platform Architecture (Support list: amd64(full support), arm64(not full support),
+     i386(not full support. Drop support in the new version)
+    :param use_async_download: Download with the asyncio download engine (async_download) instead of threads
+    :param transfer_report: telemetry.TransferReport which receives the record of every downloaded file (the finished
+     report is returned by telemetry.get_last_transfer_report())
+    :param install_plan: InstallPlan of the version (create_install_plan). The natives in the plan are downloaded
+     instead of selecting (and checking) them again
+    """
+    # parameter stuff
+    only_return_lib_paths = kwargs.get("only_return_lib_paths", False)
+    use_async_download = kwargs.get("use_async_download", False)
+    transfer_report = kwargs.get("transfer_report", None)
+    if transfer_report is None:
+        transfer_report = telemetry.TransferReport("natives")
+    install_plan = kwargs.get("install_plan", None)
+    lib_paths = []
+
+    download_list = []
+    valid_natives_count = 0
+
+    if install_plan is not None and not only_return_lib_paths:
+        for planned_file in install_plan.get_files("natives"):
+            if planned_file.valid:
+                valid_natives_count += 1
+            else:
+                download_list.append((planned_file.url, planned_file.dest_path, planned_file.sha1))
+    else:
+        # Mod-loader profiles (inheritsFrom) need to be merged with their parent first
+        version_data = resolve_version_data(version_data)
+        if version_data is None:
+            return False, "ParentVersionNotFound"
+
+        Status, natives_list = get_natives_download_list(version_data, libraries_dir, platform_name, full_arch)
+        if not Status:
+            return False, natives_list
+
+        for lib_path, lib_url, lib_dest, sha1, size in natives_list:
+            lib_paths.append(lib_path)
+            if only_return_lib_paths:
+                continue
+
+            if verify_existing_file(lib_dest, sha1, size):
+                valid_natives_count += 1
+                continue
+            download_list.append((lib_url, lib_dest, sha1))
 
     if only_return_lib_paths:
         return lib_paths
 
-    multi_thread_download(download_queue, "natives")
+    # Natives are needed to start the game, so they are downloaded before other files
+    if use_async_download:
+        async_download(download_list, "natives", priority=PRIORITY_CRITICAL, transfer_report=transfer_report)
+    elif len(download_list) > 0:
+        multi_thread_download([[item] for item in download_list], "natives", priority=PRIORITY_CRITICAL,
+                              transfer_report=transfer_report)
+    else:
+        telemetry.finish_transfer_report(transfer_report)
 
-    if len(download_queue) > 0:
+    if len(download_list) > 0 or valid_natives_count > 0:
         return True
     else:
         return False
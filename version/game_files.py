@@ -1,5 +1,22 @@
 import os.path
-from libs.Utils.utils import download_file
+from libs.Utils import utils, telemetry
+from libs.Utils.utils import download_file_with_retry
+from libs.Utils.scheduler import PRIORITY_CRITICAL
+
+
+def get_client_download(version_data, **kwargs):
+    """
+    Get the client download of version data
+    :param custom_client_url: Custom client download URL
+    :return: client_url, sha1, size (sha1 and size are None if they are unknown)
+    """
+    # parameter stuff (If the custom_client_url is available, priority uses it first.)
+    custom_client_url = kwargs.get('custom_client_url', None)
+    if custom_client_url is not None:
+        return custom_client_url, None, None
+
+    client_info = version_data['downloads']['client']
+    return client_info['url'], client_info.get("sha1", None), client_info.get("size", None)
 
 
 def download_client(version_data, client_dest, **kwargs):
@@ -10,25 +27,29 @@ def download_client(version_data, client_dest, **kwargs):
     ***Other parameters***
     :param custom_client_url: Custom client download URL
     (Priority: custom_client_url > obtain client download URL from version_data)
+    :param transfer_report: telemetry.TransferReport which receives the record of the download (the finished report is
+     returned by telemetry.get_last_transfer_report())
     """
-    dest_base_path = os.path.basename(client_dest)
-    os.makedirs(dest_base_path, exist_ok=True)
+    transfer_report = kwargs.get("transfer_report", None)
+    if transfer_report is None:
+        transfer_report = telemetry.TransferReport("client")
 
-    # parameter stuff (If the custom_client_url is available, priority uses it first.)
-    custom_client_url = kwargs.get('custom_client_url', None)
-    client_hash = None
-    if custom_client_url is not None:
-        client_url = custom_client_url
-    else:
-        # Download client.jar
-        client_info = version_data['downloads']['client']
-        client_url = client_info['url']
-        client_hash = client_info("sha1", None)
+    dest_base_path = os.path.dirname(client_dest)
+    if dest_base_path:
+        os.makedirs(dest_base_path, exist_ok=True)
+
+    # Download client.jar
+    client_url, client_hash, client_size = get_client_download(version_data, **kwargs)
 
     if client_hash is None:
         print("[Warning] Could not find the client file hash from the version data.")
 
-    download_file(client_url, client_dest)
+    # client.jar is needed to start the game, so it is downloaded before other files (large clients are downloaded in
+    # segments. Unknown size is checked by the segmented download itself)
+    segmented = client_size is None or client_size >= utils.segmented_download_threshold
+    download_file_with_retry(client_url, client_dest, sha1=client_hash, priority=PRIORITY_CRITICAL,
+                             segmented=segmented, transfer_report=transfer_report)
+    telemetry.finish_transfer_report(transfer_report)
 
     if os.path.exists(client_dest):
         return True
@@ -0,0 +1,157 @@
+"""
+libs/version/inheritance.py
+
+Resolve version data which uses "inheritsFrom" (Mod-loader profiles like Fabric, Forge, Quilt) into a merged version
+profile. Merged profiles are memoized (in-process and on-disk) by the hashes of their inputs.
+"""
+import copy
+import hashlib
+import json
+import os
+from LauncherBase import Base
+from libs.version.version import get_version_data, get_version_data_from_exist_data
+
+_merged_profiles = {}
+
+# Keys which are merged instead of overridden by the child profile
+_merged_keys = ("libraries", "arguments", "inheritsFrom")
+
+
+def get_merged_profile_cache_folder():
+    return os.path.join(Base.launcher_root_dir, "cache", "profiles")
+
+
+def get_version_data_hash(version_data):
+    return hashlib.sha1(json.dumps(version_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_library_coordinate(library):
+    """
+    Get the maven coordinate of a library without its version ("group:artifact[:classifier][@extension]")
+    :return: coordinate (library without name return None)
+    """
+    name = library.get("name", None)
+    if name is None:
+        return None
+
+    extension = None
+    if "@" in name:
+        name, extension = name.split("@", 1)
+
+    components = name.split(":")
+    if len(components) < 3:
+        return name
+
+    coordinate = f"{components[0]}:{components[1]}"
+    if len(components) > 3:
+        coordinate += f":{components[3]}"
+    if extension is not None:
+        coordinate += f"@{extension}"
+    return coordinate
+
+
+def merge_version_data(parent_version_data, child_version_data):
+    """
+    Merge a child profile into its parent profile
+    Libraries: child libraries first, parent libraries with the same maven coordinate are dropped
+    Arguments: parent arguments + child arguments (game and jvm)
+    Other keys (mainClass, id, type, minecraftArguments...): child overrides parent
+    """
+    merged = copy.deepcopy(parent_version_data)
+
+    for key, value in child_version_data.items():
+        if key not in _merged_keys:
+            merged[key] = copy.deepcopy(value)
+
+    child_libraries = child_version_data.get("libraries", [])
+    child_coordinates = {get_library_coordinate(library) for library in child_libraries}
+    child_coordinates.discard(None)
+    merged["libraries"] = copy.deepcopy(child_libraries) + [
+        library for library in merged.get("libraries", [])
+        if get_library_coordinate(library) not in child_coordinates
+    ]
+
+    child_arguments = child_version_data.get("arguments", None)
+    if child_arguments is not None:
+        merged_arguments = merged.setdefault("arguments", {})
+        for argument_type, arguments in child_arguments.items():
+            merged_arguments[argument_type] = merged_arguments.get(argument_type, []) + copy.deepcopy(arguments)
+
+    merged.pop("inheritsFrom", None)
+    return merged
+
+
+def _load_version_data(version_id, **kwargs):
+    version_data = get_version_data_from_exist_data(version_id, **kwargs)
+    if version_data is None:
+        version_data = get_version_data(version_id, **kwargs)
+    return version_data
+
+
+def resolve_version_data(version_data, **kwargs):
+    """
+    Resolve "inheritsFrom" of version data (recursively) into a merged version profile
+    The returned profile is shared between callers, don't modify it.
+    :param version_data: Version data (data without "inheritsFrom" is returned as it is)
+    ***Other parameters***
+    :param parent_version_data: Use this data as the parent instead of loading it (exist data > version manifest)
+    :param custom_version_manifest_url: Custom version manifest URL (for loading the parent)
+    :return: merged version data (parent not found return None)
+    """
+    # parameter stuff
+    parent_version_data = kwargs.pop("parent_version_data", None)
+
+    parent_version_id = version_data.get("inheritsFrom", None)
+    if parent_version_id is None:
+        return version_data
+
+    if parent_version_data is None:
+        parent_version_data = _load_version_data(parent_version_id, **kwargs)
+        if parent_version_data is None:
+            print(f"[DEBUG] Unable to find the parent version {parent_version_id} of {version_data.get('id', None)}")
+            return None
+
+    parent_version_data = resolve_version_data(parent_version_data, **kwargs)
+    if parent_version_data is None:
+        return None
+
+    merge_key = hashlib.sha1(
+        f"{get_version_data_hash(version_data)}:{get_version_data_hash(parent_version_data)}".encode("utf-8")
+    ).hexdigest()
+
+    merged = _merged_profiles.get(merge_key, None)
+    if merged is not None:
+        return merged
+
+    merged_profile_path = os.path.join(get_merged_profile_cache_folder(), f"{merge_key}.json")
+    if os.path.exists(merged_profile_path):
+        try:
+            with open(merged_profile_path, "r") as f:
+                merged = json.load(f)
+        except (OSError, ValueError):
+            merged = None
+
+    if merged is None:
+        merged = merge_version_data(parent_version_data, version_data)
+        try:
+            os.makedirs(get_merged_profile_cache_folder(), exist_ok=True)
+            tmp_path = f"{merged_profile_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(merged, f)
+            os.replace(tmp_path, merged_profile_path)
+        except OSError as e:
+            print(f"[DEBUG] Unable to save merged profile {merged_profile_path}. ERR:{e}")
+
+    _merged_profiles[merge_key] = merged
+    return merged
+
+
+def get_resolved_version_data(version_id, **kwargs):
+    """
+    Get version data of version_id (exist data > version manifest) and resolve its "inheritsFrom"
+    :return: merged version data (not found return None)
+    """
+    version_data = _load_version_data(version_id, **kwargs)
+    if version_data is None:
+        return None
+    return resolve_version_data(version_data, **kwargs)
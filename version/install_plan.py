@@ -0,0 +1,245 @@
+"""
+libs/version/install_plan.py
+
+Dry-run install planner. create_install_plan walks a version through the same selection logic as download_libraries,
+download_natives, download_client and the java runtime manifest, checks every file against the disk and returns an
+InstallPlan (files to fetch, bytes to fetch, files which are already valid). The plan can be executed as it is
+(execute_install_plan) or passed to the downloaders (install_plan=...), so the files are selected and checked only once.
+The java runtime of a plan is installed by download_java_runtime_files, so it gets the same directories, links,
+executable flags and installed state as a normal runtime install.
+"""
+import os
+from LauncherBase import Base
+from libs.Utils.utils import multi_thread_download
+from libs.Utils import telemetry
+from libs.Utils.crypto import verify_existing_file
+from libs.Utils.scheduler import PRIORITY_CRITICAL, get_library_priority
+from libs.libraries.libraries import get_library_download_list, get_natives_download_list
+from libs.version.inheritance import resolve_version_data
+from libs.version.game_files import get_client_download
+from libs.java.java_info import (get_support_java_version, get_support_java_version_from_java_version_manifest,
+                                 get_support_java_runtime_version_data)
+from libs.java.jvm_installer import jvm_installer
+
+plan_categories = ("client", "natives", "libraries", "java_runtime")
+
+
+class PlannedFile:
+    """
+    name: Path of the file in its category (library path, runtime file path...) | valid: The file already exists and
+    matches its size and sha1 (size is None if it is unknown)
+    """
+    __slots__ = ("category", "name", "url", "dest_path", "sha1", "size", "valid")
+
+    def __init__(self, category, name, url, dest_path, sha1, size):
+        self.category = category
+        self.name = name
+        self.url = url
+        self.dest_path = dest_path
+        self.sha1 = sha1
+        self.size = size
+        self.valid = verify_existing_file(dest_path, sha1, size)
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class InstallPlan:
+    def __init__(self, version_id):
+        self.version_id = version_id
+        self.files = []
+        self.errors = {}  # {category: error} (categories which couldn't be planned)
+        self.java_runtime_manifest = None
+        self.java_runtime_dir = None
+
+    def add_file(self, category, name, url, dest_path, sha1=None, size=None):
+        planned_file = PlannedFile(category, name, url, dest_path, sha1, size)
+        self.files.append(planned_file)
+        return planned_file
+
+    def get_files(self, category=None, only_missing=False):
+        return [planned_file for planned_file in self.files
+                if (category is None or planned_file.category == category)
+                and not (only_missing and planned_file.valid)]
+
+    @property
+    def files_to_fetch(self):
+        return self.get_files(only_missing=True)
+
+    @property
+    def bytes_to_fetch(self):
+        """
+        Bytes of the files to fetch (files with unknown size are counted in get_summary()["unknown_size_files"])
+        """
+        return sum(planned_file.size for planned_file in self.files_to_fetch if planned_file.size is not None)
+
+    @property
+    def valid_files(self):
+        return [planned_file for planned_file in self.files if planned_file.valid]
+
+    def get_summary(self):
+        summary = {}
+        for category in plan_categories:
+            files = self.get_files(category)
+            missing_files = [planned_file for planned_file in files if not planned_file.valid]
+            summary[category] = {
+                "files": len(files),
+                "files_to_fetch": len(missing_files),
+                "bytes_to_fetch": sum(planned_file.size for planned_file in missing_files
+                                      if planned_file.size is not None),
+                "valid_files": len(files) - len(missing_files),
+            }
+
+        summary["total"] = {
+            "files": len(self.files),
+            "files_to_fetch": len(self.files_to_fetch),
+            "bytes_to_fetch": self.bytes_to_fetch,
+            "valid_files": len(self.valid_files),
+            "unknown_size_files": sum(1 for planned_file in self.files_to_fetch if planned_file.size is None),
+        }
+        return summary
+
+    def to_dict(self):
+        return {
+            "version_id": self.version_id,
+            "summary": self.get_summary(),
+            "errors": dict(self.errors),
+            "files": [planned_file.to_dict() for planned_file in self.files],
+        }
+
+
+def _get_java_runtime_manifest(version_data):
+    """
+    :return: Java runtime manifest of the version (failed return None)
+    """
+    Status, component, major_version = get_support_java_version(version_data)
+    if not Status:
+        return None
+
+    # Unavailable java manifest (offline, cold cache...) returns False, None instead of the support list
+    support_list = get_support_java_version_from_java_version_manifest(Base.Platform, Base.FullArch)
+    if not isinstance(support_list, list) or len(support_list) == 0:
+        return None
+
+    Status, manifest = get_support_java_runtime_version_data(support_list, major_version)
+    if not Status:
+        return None
+    return manifest
+
+
+def create_install_plan(version_data, libraries_dir, **kwargs):
+    """
+    Plan the install of a version without downloading anything
+    :param version_data: Minecraft version data (JSON)
+    :param libraries_dir: libraries folder
+    ***Other parameters***
+    :param client_dest: Client file destination (None = don't plan the client)
+    :param custom_client_url: Custom client download URL
+    :param java_runtime_dir: Install folder of the java runtime (None = don't plan the java runtime)
+    :param java_runtime_manifest: Java runtime manifest (default: the runtime manifest of the version's javaVersion)
+    :param platform_name: System (Platform) name of the natives (default: Base.Platform)
+    :param full_arch: Platform Architecture of the natives (default: Base.FullArch)
+    :return: Status, InstallPlan (failed return False, error)
+    """
+    # parameter stuff
+    client_dest = kwargs.get("client_dest", None)
+    java_runtime_dir = kwargs.get("java_runtime_dir", None)
+    java_runtime_manifest = kwargs.get("java_runtime_manifest", None)
+    platform_name = kwargs.get("platform_name", Base.Platform)
+    full_arch = kwargs.get("full_arch", Base.FullArch)
+
+    # Mod-loader profiles (inheritsFrom) need to be merged with their parent first
+    version_data = resolve_version_data(version_data)
+    if version_data is None:
+        return False, "ParentVersionNotFound"
+
+    plan = InstallPlan(version_data.get("id", None))
+
+    if client_dest is not None:
+        try:
+            client_url, client_sha1, client_size = get_client_download(version_data, **kwargs)
+            plan.add_file("client", os.path.basename(client_dest), client_url, client_dest, client_sha1, client_size)
+        except KeyError:
+            plan.errors["client"] = "ClientDownloadNotFound"
+
+    Status, natives_list = get_natives_download_list(version_data, libraries_dir, platform_name, full_arch)
+    if Status:
+        for lib_path, lib_url, lib_dest, sha1, size in natives_list:
+            plan.add_file("natives", lib_path, lib_url, lib_dest, sha1, size)
+    else:
+        plan.errors["natives"] = natives_list
+
+    for lib_path, lib_url, lib_dest, sha1, size in get_library_download_list(version_data, libraries_dir):
+        plan.add_file("libraries", lib_path, lib_url, lib_dest, sha1, size)
+
+    if java_runtime_dir is not None:
+        if java_runtime_manifest is None:
+            java_runtime_manifest = _get_java_runtime_manifest(version_data)
+
+        if java_runtime_manifest is None:
+            plan.errors["java_runtime"] = "JavaRuntimeManifestNotFound"
+        else:
+            plan.java_runtime_manifest = java_runtime_manifest
+            plan.java_runtime_dir = java_runtime_dir
+            for file_path, file_url, file_dest, sha1, size in jvm_installer.get_java_runtime_download_list(
+                    java_runtime_manifest, java_runtime_dir):
+                plan.add_file("java_runtime", file_path, file_url, file_dest, sha1, size)
+
+    return True, plan
+
+
+def execute_install_plan(plan, **kwargs):
+    """
+    Download the files which the plan has to fetch. Client, natives and libraries are downloaded in one batch (client
+    and natives go first), the java runtime is installed by download_java_runtime_files.
+    :param max_workers: Max download threads (default: 8)
+    :param transfer_report: telemetry.TransferReport which receives the record of every file (the finished report is
+     returned by telemetry.get_last_transfer_report())
+    :return: downloaded_files, failed_files [(url, dest_path)]
+    """
+    max_workers = kwargs.get("max_workers", 8)
+    transfer_report = kwargs.get("transfer_report", None)
+    if transfer_report is None:
+        transfer_report = telemetry.TransferReport(plan.version_id or "files")
+
+    downloaded_files = []
+    failed_files = []
+
+    batch_files = [planned_file for planned_file in plan.files_to_fetch if planned_file.category != "java_runtime"]
+    if len(batch_files) > 0:
+        category_dict = {planned_file.dest_path: planned_file.category for planned_file in batch_files}
+
+        def get_priority(url, dest_path):
+            if category_dict.get(dest_path, None) in ("client", "natives"):
+                return PRIORITY_CRITICAL
+            return get_library_priority(url, dest_path)
+
+        downloaded_files, failed_files = multi_thread_download(
+            [[(planned_file.url, planned_file.dest_path, planned_file.sha1)] for planned_file in batch_files],
+            plan.version_id or "files", max_workers=max_workers, priority=get_priority,
+            transfer_report=transfer_report)
+
+        # Downloaded files are verified while they are downloading
+        downloaded_file_set = set(downloaded_files)
+        for planned_file in batch_files:
+            if planned_file.dest_path in downloaded_file_set:
+                planned_file.valid = True
+
+    runtime_files = plan.get_files("java_runtime", only_missing=True)
+    if len(runtime_files) > 0:
+        os.makedirs(plan.java_runtime_dir, exist_ok=True)
+        failed_runtime_files = []
+        jvm_installer.download_java_runtime_files(plan.java_runtime_manifest, plan.java_runtime_dir,
+                                                  install_plan=plan, failed_files=failed_runtime_files,
+                                                  transfer_report=transfer_report)
+        failed_runtime_file_set = set(failed_runtime_files)
+        for planned_file in runtime_files:
+            if planned_file.name in failed_runtime_file_set:
+                failed_files.append((planned_file.url, planned_file.dest_path))
+            else:
+                planned_file.valid = True
+                downloaded_files.append(planned_file.dest_path)
+
+    # The batch and the runtime install share the report (finishing it again updates the saved report)
+    telemetry.finish_transfer_report(transfer_report)
+    return downloaded_files, failed_files
@@ -0,0 +1,270 @@
+"""
+libs/version/manifest.py
+
+Get version_manifest_v2.json (cached in-process and on-disk, revalidated after version_manifest_cache_ttl)
+"""
+import hashlib
+import json
+import os
+from LauncherBase import Base
+from libs.Utils.cache import get_cached_json
+from libs.version.legacy import legacy_version_support
+
+mojang_version_manifest_url = "https://piston-meta.mojang.com/mc/game/version_manifest_v2.json"
+version_manifest_cache_ttl = 600  # Seconds
+
+
+def get_version_manifest_cache_folder():
+    return os.path.join(Base.launcher_root_dir, "cache", "manifest")
+
+
+def get_version_manifest(version_manifest_url=mojang_version_manifest_url, **kwargs):
+    """
+    Get version_manifest_v2.json data (If the cached copy does not expire, no request will be sent)
+    :param version_manifest_url: Version manifest URL
+    ***Other parameters***
+    :param manifest_cache_ttl: Seconds before the cached manifest needs to be revalidated
+    :param force_refresh: Revalidate the cached manifest even if it does not expire
+    :param cache_only: Only use the cached manifest (even if it expired), never send a request
+    :return: version manifest data (None if unavailable)
+    """
+    # parameter stuff
+    ttl = kwargs.get("manifest_cache_ttl", version_manifest_cache_ttl)
+    force_refresh = kwargs.get("force_refresh", False)
+    cache_only = kwargs.get("cache_only", False)
+
+    return get_cached_json(version_manifest_url, get_version_manifest_cache_folder(), ttl=ttl,
+                           force_refresh=force_refresh, cache_only=cache_only)
+
+
+class VersionManifest:
+    """
+    Indexed version_manifest_v2.json (built once from the manifest data)
+    versions: Manifest order (newest first) | ordered_versions: Ordered by releaseTime (oldest first)
+    """
+    version_types = ("release", "snapshot", "old_beta", "old_alpha")
+
+    def __init__(self, manifest_data):
+        self.latest = manifest_data.get("latest", {})
+        self.versions = manifest_data.get("versions", [])
+        self.version_index = {}
+        self.type_index = {version_type: [] for version_type in self.version_types}
+
+        for version in self.versions:
+            self.version_index[version["id"]] = version
+            self.type_index.setdefault(version.get("type", None), []).append(version)
+
+        self.ordered_versions = sorted(self.versions, key=lambda v: v.get("releaseTime", ""))
+        self.release_order = {version["id"]: position for position, version in enumerate(self.ordered_versions)}
+
+    def __contains__(self, version_id):
+        return version_id in self.version_index
+
+    def __len__(self):
+        return len(self.versions)
+
+    def get(self, version_id):
+        """Get the manifest entry of version_id (not found return None)"""
+        return self.version_index.get(version_id, None)
+
+    def get_type(self, version_id):
+        version = self.version_index.get(version_id, None)
+        return version.get("type", None) if version is not None else None
+
+    def get_url(self, version_id):
+        version = self.version_index.get(version_id, None)
+        return version.get("url", None) if version is not None else None
+
+    def get_url_and_sha1(self, version_id):
+        """
+        :return: version data url, version data sha1 (not found return None, None)
+        """
+        version = self.version_index.get(version_id, None)
+        if version is None:
+            return None, None
+        return version.get("url", None), version.get("sha1", None)
+
+    def get_version_list(self, version_type=None):
+        """Get version id list in manifest order (version_type=None return all versions)"""
+        if version_type is None:
+            return [version["id"] for version in self.versions]
+        return [version["id"] for version in self.type_index.get(version_type, [])]
+
+    def get_latest(self, version_type):
+        """
+        Get the newest version id of version_type
+        (release/stable and snapshot/newest use key 'latest', other types use the newest releaseTime)
+        """
+        if version_type == "stable" or version_type == "release":
+            return self.latest.get("release", None)
+        elif version_type == "snapshot" or version_type == "newest":
+            return self.latest.get("snapshot", None)
+
+        type_versions = self.type_index.get(version_type, [])
+        if len(type_versions) == 0:
+            return None
+        return max(type_versions, key=lambda v: v.get("releaseTime", ""))["id"]
+
+    def get_versions_between(self, start_version_id, end_version_id, version_type=None):
+        """
+        Get version ids between start_version_id and end_version_id (both included, ordered by releaseTime)
+        :return: version id list (start or end version not found return None)
+        """
+        start = self.release_order.get(start_version_id, None)
+        end = self.release_order.get(end_version_id, None)
+        if start is None or end is None:
+            return None
+
+        if start > end:
+            start, end = end, start
+
+        return [version["id"] for version in self.ordered_versions[start:end + 1]
+                if version_type is None or version.get("type", None) == version_type]
+
+
+_version_manifest_index = {}
+
+
+def get_version_manifest_index(version_manifest_url=mojang_version_manifest_url, **kwargs):
+    """
+    Get VersionManifest of version_manifest_url (rebuilt only when the cached manifest data changed)
+    :return: VersionManifest (None if the manifest is unavailable)
+    """
+    data = get_version_manifest(version_manifest_url, **kwargs)
+    if data is None:
+        return None
+
+    indexed = _version_manifest_index.get(version_manifest_url, None)
+    if indexed is not None and indexed[0] is data:
+        return indexed[1]
+
+    manifest = VersionManifest(data)
+    _version_manifest_index[version_manifest_url] = (data, manifest)
+    return manifest
+
+
+class UnifiedVersionManifest(VersionManifest):
+    """
+    VersionManifest over the official and the legacy version manifest (official entries take precedence)
+    Every entry is tagged by its origin ("official" or "legacy") in origin_index.
+    """
+    origins = ("official", "legacy")
+
+    def __init__(self, official_manifest_data, legacy_manifest_data):
+        official_versions = official_manifest_data.get("versions", []) if official_manifest_data else []
+        legacy_versions = legacy_manifest_data.get("versions", []) if legacy_manifest_data else []
+
+        self.origin_index = {version["id"]: "official" for version in official_versions}
+        unified_versions = list(official_versions)
+        for version in legacy_versions:
+            if version["id"] not in self.origin_index:
+                self.origin_index[version["id"]] = "legacy"
+                unified_versions.append(version)
+
+        latest = official_manifest_data.get("latest", {}) if official_manifest_data else {}
+        super().__init__({"latest": latest, "versions": unified_versions})
+
+    def get_origin(self, version_id):
+        """Get the origin of version_id ("official" or "legacy". not found return None)"""
+        return self.origin_index.get(version_id, None)
+
+    def get_version_list(self, version_type=None, origin=None):
+        """Get version id list (version_type/origin=None return all versions)"""
+        version_list = super().get_version_list(version_type)
+        if origin is None:
+            return version_list
+        return [version_id for version_id in version_list if self.origin_index[version_id] == origin]
+
+
+_unified_version_manifest_index = None
+
+
+def get_unified_version_manifest_index(**kwargs):
+    """
+    Get UnifiedVersionManifest (official + legacy manifest. Rebuilt only when one of the cached manifests changed)
+    ***Other parameters***
+    :param custom_version_manifest_url: Custom official version manifest URL
+    :param custom_legacy_version_manifest_url: Custom legacy version manifest URL
+    :return: UnifiedVersionManifest (both manifests are unavailable return None)
+    """
+    global _unified_version_manifest_index
+
+    # parameter stuff
+    version_manifest_url = kwargs.get("custom_version_manifest_url", mojang_version_manifest_url)
+    legacy_version_manifest_url = kwargs.get("custom_legacy_version_manifest_url",
+                                             legacy_version_support.legacy_version_manifest)
+
+    official_data = get_version_manifest(version_manifest_url, **kwargs)
+    legacy_data = get_version_manifest(legacy_version_manifest_url, **kwargs)
+    if official_data is None and legacy_data is None:
+        return None
+
+    indexed = _unified_version_manifest_index
+    if indexed is not None and indexed[0] is official_data and indexed[1] is legacy_data:
+        return indexed[2]
+
+    manifest = UnifiedVersionManifest(official_data, legacy_data)
+    _unified_version_manifest_index = (official_data, legacy_data, manifest)
+    return manifest
+
+
+def get_version_manifest_sync_path(version_manifest_url=mojang_version_manifest_url):
+    url_hash = hashlib.sha1(version_manifest_url.encode("utf-8")).hexdigest()
+    return os.path.join(get_version_manifest_cache_folder(), f"{url_hash}.sync.json")
+
+
+def load_version_manifest_snapshot(version_manifest_url=mojang_version_manifest_url):
+    """
+    Load the version snapshot ({version_id: {"sha1": sha1, "time": time}}) saved by the last sync
+    :return: snapshot (Never synced return None)
+    """
+    sync_path = get_version_manifest_sync_path(version_manifest_url)
+    if not os.path.exists(sync_path):
+        return None
+
+    try:
+        with open(sync_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_version_manifest_snapshot(manifest, version_manifest_url=mojang_version_manifest_url):
+    snapshot = {version["id"]: {"sha1": version.get("sha1", None), "time": version.get("time", None)}
+                for version in manifest.versions}
+    sync_path = get_version_manifest_sync_path(version_manifest_url)
+
+    try:
+        os.makedirs(os.path.dirname(sync_path), exist_ok=True)
+        tmp_path = f"{sync_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, sync_path)
+    except OSError as e:
+        print(f"[DEBUG] Unable to save version manifest snapshot. ERR:{e}")
+        return False
+
+    return True
+
+
+def diff_version_manifest(old_snapshot, manifest):
+    """
+    Compare VersionManifest with the snapshot of the last sync
+    :return: {"added": [version_id], "changed": [version_id] (sha1 or time changed), "removed": [version_id]}
+    """
+    if old_snapshot is None:
+        old_snapshot = {}
+
+    added = []
+    changed = []
+    for version in manifest.versions:
+        old_version = old_snapshot.get(version["id"], None)
+        if old_version is None:
+            added.append(version["id"])
+        elif old_version.get("sha1", None) != version.get("sha1", None) or \
+                old_version.get("time", None) != version.get("time", None):
+            changed.append(version["id"])
+
+    removed = [version_id for version_id in old_snapshot if version_id not in manifest]
+
+    return {"added": added, "changed": changed, "removed": removed}
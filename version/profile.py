@@ -0,0 +1,124 @@
+"""
+libs/version/profile.py
+
+Parsed version data (VersionProfile). The libraries/arguments/downloads trees of a version data are parsed once into
+slotted objects and shared by download_libraries, download_natives, generate_classpath and get_support_game_args.
+Profiles are cached by the content hash of the version data (the same hash as the merged profiles of inheritance), so
+the cache doesn't keep the version data itself alive.
+"""
+import threading
+from collections import OrderedDict
+from libs.version.inheritance import get_version_data_hash
+
+# Max parsed profiles kept in memory (keyed by the hash of the version data)
+profile_cache_size = 32
+
+_profile_cache = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+
+class Rule:
+    __slots__ = ("action", "os_name", "os_arch", "features")
+
+    def __init__(self, rule_data):
+        os_data = rule_data.get("os", {})
+        self.action = rule_data.get("action", None)
+        self.os_name = os_data.get("name", None)
+        self.os_arch = os_data.get("arch", None)
+        self.features = rule_data.get("features", None)
+
+
+class Artifact:
+    __slots__ = ("path", "url", "sha1", "size")
+
+    def __init__(self, artifact_data):
+        self.path = artifact_data.get("path", None)
+        self.url = artifact_data.get("url", None)
+        self.sha1 = artifact_data.get("sha1", None)
+        self.size = artifact_data.get("size", None)
+
+
+class Library:
+    """
+    classifiers: None if the library doesn't have the "classifiers" key, else {classifier: Artifact}
+    """
+    __slots__ = ("name", "artifact", "classifiers", "natives", "rules")
+
+    def __init__(self, library_data):
+        downloads = library_data.get("downloads", {})
+        artifact_data = downloads.get("artifact", None)
+        classifiers_data = downloads.get("classifiers", None)
+
+        self.name = library_data.get("name", None)
+        self.artifact = Artifact(artifact_data) if artifact_data else None
+        self.classifiers = {classifier: Artifact(data) for classifier, data in classifiers_data.items()} \
+            if classifiers_data is not None else None
+        self.natives = library_data.get("natives", {})
+        self.rules = tuple(Rule(rule) for rule in library_data.get("rules", []))
+
+
+class Argument:
+    """
+    values: Argument values (always a tuple) | rules: Rules of the argument (plain string argument has no rules)
+    """
+    __slots__ = ("values", "rules")
+
+    def __init__(self, argument_data):
+        if isinstance(argument_data, dict):
+            value = argument_data.get("value", [])
+            self.values = tuple(value) if isinstance(value, list) else (value,)
+            self.rules = tuple(Rule(rule) for rule in argument_data.get("rules", []))
+        else:
+            self.values = (argument_data,)
+            self.rules = ()
+
+
+class VersionProfile:
+    """
+    game_arguments/jvm_arguments: None if the version data doesn't have "arguments" (legacy version uses
+    minecraft_arguments)
+    """
+    __slots__ = ("id", "type", "main_class", "libraries", "game_arguments", "jvm_arguments", "minecraft_arguments",
+                 "client_download", "asset_index", "java_version")
+
+    def __init__(self, version_data):
+        arguments = version_data.get("arguments", None)
+        downloads = version_data.get("downloads", {})
+        client_data = downloads.get("client", None)
+
+        self.id = version_data.get("id", None)
+        self.type = version_data.get("type", None)
+        self.main_class = version_data.get("mainClass", None)
+        self.libraries = tuple(Library(library) for library in version_data.get("libraries", []))
+        self.game_arguments = tuple(Argument(argument) for argument in arguments["game"]) \
+            if arguments is not None and "game" in arguments else None
+        self.jvm_arguments = tuple(Argument(argument) for argument in arguments["jvm"]) \
+            if arguments is not None and "jvm" in arguments else None
+        self.minecraft_arguments = version_data.get("minecraftArguments", None)
+        self.client_download = Artifact(client_data) if client_data else None
+        self.asset_index = version_data.get("assetIndex", None)
+        self.java_version = version_data.get("javaVersion", None)
+
+
+def get_version_profile(version_data):
+    """
+    Get the parsed VersionProfile of version data (version data with the same content is parsed only once)
+    :param version_data: Version data (json data. A VersionProfile is returned as it is)
+    :return: VersionProfile
+    """
+    if isinstance(version_data, VersionProfile):
+        return version_data
+
+    key = get_version_data_hash(version_data)
+    with _profile_cache_lock:
+        profile = _profile_cache.get(key, None)
+        if profile is not None:
+            _profile_cache.move_to_end(key)
+            return profile
+
+    profile = VersionProfile(version_data)
+    with _profile_cache_lock:
+        _profile_cache[key] = profile
+        if len(_profile_cache) > profile_cache_size:
+            _profile_cache.popitem(last=False)
+    return profile
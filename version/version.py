@@ -5,10 +5,34 @@ A function to get version_manifest data or get the specified version data
 """
 import json
 import os
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from LauncherBase import Base
+from libs.Utils import network
+from libs.version.manifest import (mojang_version_manifest_url, get_version_manifest_index,
+                                   get_unified_version_manifest_index,
+                                   load_version_manifest_snapshot, save_version_manifest_snapshot,
+                                   diff_version_manifest)
+from libs.version.version_store import (fetch_version_data, load_version_data_from_store,
+                                        remove_version_data_from_store)
 
-mojang_version_manifest_url = "https://piston-meta.mojang.com/mc/game/version_manifest_v2.json"
+
+def get_manifest_index(**kwargs):
+    """
+    Get the indexed version manifest used by the version lookups
+    ***Other parameters***
+    :param custom_version_manifest_url: Custom version manifest URL
+    :param include_legacy_manifest: Use the unified index of the official and the legacy manifest (any id is
+    resolved in one lookup)
+    :return: VersionManifest (None if unavailable)
+    """
+    # parameter stuff
+    version_manifest_url = kwargs.get("custom_version_manifest_url", mojang_version_manifest_url)
+    include_legacy_manifest = kwargs.get("include_legacy_manifest", False)
+
+    if include_legacy_manifest:
+        return get_unified_version_manifest_index(**kwargs)
+    return get_version_manifest_index(version_manifest_url, **kwargs)
 
 
 def get_version_data(version_id, **kwargs):
@@ -16,29 +40,116 @@ def get_version_data(version_id, **kwargs):
     Get version_manifest_v2.json and find requires version of json data
     """
 
+    manifest = get_manifest_index(**kwargs)
+    if manifest is None:
+        return None
+
+    version_url, version_sha1 = manifest.get_url_and_sha1(version_id)
+    if version_url is None:
+        return None
+
+    # Get version data (served from the version store if the sha1 matches)
+    return fetch_version_data(version_url, version_sha1)
+
+
+def get_version_data_list(version_ids, max_workers=8, **kwargs):
+    """
+    Get version data of multiple versions at once (resolved against one manifest fetch, version data which isn't
+    in the version store is downloaded concurrently over a pooled connection)
+    :param version_ids: Minecraft version id list
+    :param max_workers: Max concurrent downloads
+    :return: {version_id: version_data}, {version_id: ErrorMessage} (failed versions)
+    """
+    version_data_dict = {}
+    failed_versions = {}
+
+    manifest = get_manifest_index(**kwargs)
+    if manifest is None:
+        for version_id in version_ids:
+            failed_versions[version_id] = "VersionManifestUnavailable"
+        return version_data_dict, failed_versions
+
+    download_task = {}
+    network.ensure_pool_size(max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for version_id in dict.fromkeys(version_ids):
+            version_url, version_sha1 = manifest.get_url_and_sha1(version_id)
+            if version_url is None:
+                failed_versions[version_id] = "UnknownVersion"
+                continue
+
+            future = executor.submit(fetch_version_data, version_url, version_sha1)
+            download_task[future] = version_id
+
+        for future in as_completed(download_task):
+            version_id = download_task[future]
+            try:
+                version_data = future.result()
+            except Exception as e:
+                failed_versions[version_id] = f"GetVersionDataFailed>Error:{e}"
+                continue
+
+            if version_data is None:
+                failed_versions[version_id] = "GetVersionDataFailed"
+            else:
+                version_data_dict[version_id] = version_data
+
+    return version_data_dict, failed_versions
+
+
+def sync_version_manifest(**kwargs):
+    """
+    Refresh version_manifest_v2.json and find the versions which were added, changed (sha1/time) or removed since
+    the last sync. Stored version data of removed versions and versions whose sha1 changed is invalidated, and only
+    those changed versions which were stored before get refetched (added versions are fetched only if prefetch_new_versions is enabled).
+    ***Other parameters***
+    :param custom_version_manifest_url: Custom version manifest URL
+    :param prefetch_new_versions: Fetch version data of added versions
+    :param prefetch_types: Only prefetch added versions of these types (Example: ["release"]. Default: all types)
+    :param background: Refetch in a background thread (the result's "failed" will be empty)
+    :return: Status, {"added": [], "changed": [], "removed": [], "failed": {version_id: ErrorMessage}}
+    """
     # parameter stuff
     version_manifest_url = kwargs.get("custom_version_manifest_url", mojang_version_manifest_url)
+    prefetch_new_versions = kwargs.get("prefetch_new_versions", False)
+    prefetch_types = kwargs.get("prefetch_types", None)
+    background = kwargs.get("background", False)
 
-    response = requests.get(version_manifest_url)
-    data = response.json()
-    version_list = data['versions']
-
-    version_url = None
-    for v in version_list:
-        if v['id'] == version_id:
-            version_url = v['url']
-            break
+    manifest = get_version_manifest_index(version_manifest_url, force_refresh=True)
+    if manifest is None:
+        return False, None
 
-    if version_url is None:
-        return None
+    old_snapshot = load_version_manifest_snapshot(version_manifest_url)
+    manifest_diff = diff_version_manifest(old_snapshot, manifest)
+    manifest_diff["failed"] = {}
+
+    refetch_version_ids = []
+    for version_id in manifest_diff["changed"] + manifest_diff["removed"]:
+        old_sha1 = old_snapshot[version_id].get("sha1", None)
+        new_sha1 = manifest.get_url_and_sha1(version_id)[1] if version_id in manifest else None
+        # Only the time changed, the stored version data is still valid
+        if old_sha1 is None or old_sha1 == new_sha1:
+            continue
+        if remove_version_data_from_store(old_sha1) and new_sha1 is not None:
+            refetch_version_ids.append(version_id)
+
+    if prefetch_new_versions:
+        for version_id in manifest_diff["added"]:
+            if prefetch_types is None or manifest.get_type(version_id) in prefetch_types:
+                refetch_version_ids.append(version_id)
+
+    save_version_manifest_snapshot(manifest, version_manifest_url)
+
+    if len(refetch_version_ids) > 0:
+        if background:
+            threading.Thread(target=get_version_data_list, args=(refetch_version_ids,),
+                             kwargs={"custom_version_manifest_url": version_manifest_url}, daemon=True).start()
+        else:
+            _, manifest_diff["failed"] = get_version_data_list(refetch_version_ids,
+                                                               custom_version_manifest_url=version_manifest_url)
 
-    try:
-        # Get version data
-        version_response = requests.get(version_url)
-        version_data = version_response.json()
-        return version_data
-    except Exception as e:
-        return None
+    return True, manifest_diff
 
 
 def check_minecraft_version_are_valid(version_id):
@@ -57,35 +168,22 @@ def check_minecraft_version_are_valid(version_id):
 def get_minecraft_version_type(version_id, **kwargs):
     """Get version type"""
 
-    # parameter stuff
-    version_manifest_url = kwargs.get("custom_version_manifest_url", mojang_version_manifest_url)
-
-    response = requests.get(version_manifest_url)
-    data = response.json()
-
-    for version in data["versions"]:
-        if version["id"] == version_id:
-            return version["type"]
+    manifest = get_manifest_index(**kwargs)
+    if manifest is None:
+        return None
 
-    return None
+    return manifest.get_type(version_id)
 
 
 def get_minecraft_version_url(version_id, **kwargs):
     """
     Get minecraft version url using version_id
     """
-    # parameter stuff
-    version_manifest_url = kwargs.get("custom_version_manifest_url", mojang_version_manifest_url)
-
-    response = requests.get(version_manifest_url)
-    data = response.json()
-    version_list = data['versions']
+    manifest = get_manifest_index(**kwargs)
+    if manifest is None:
+        return None
 
-    version_url = None
-    for v in version_list:
-        if v['id'] == version_id:
-            version_url = v['url']
-            break
+    version_url = manifest.get_url(version_id)
 
     if version_url is None:
         print(f"[DEBUG] Unable to find same as requires version id: {version_id} in the version_manifest.")
@@ -103,27 +201,16 @@ def get_minecraft_version_list(**args):
     only_return_release = args.get("only_return_release", False)
     only_return_snapshot = args.get("only_return_snapshot", False)
 
-    response = requests.get(version_manifest_url)
-    data = response.json()
-    version_list = data['versions']
-
-    release_version_id_list = []
-    full_version_id_list = []
-    snapshot_version_id_list = []
-    for v in version_list:
-        v_id = v['id']
-        full_version_id_list.append(v_id)
-        if v["type"] == "snapshot":
-            snapshot_version_id_list.append(v_id)
-        elif v["type"] == "release":
-            release_version_id_list.append(v_id)
+    manifest = get_version_manifest_index(version_manifest_url, **args)
+    if manifest is None:
+        return []
 
     if only_return_release:
-        return release_version_id_list
+        return manifest.get_version_list("release")
     elif only_return_snapshot:
-        return snapshot_version_id_list
+        return manifest.get_version_list("snapshot")
 
-    return full_version_id_list
+    return manifest.get_version_list()
 
 
 def get_stable_or_newest_minecraft_version(version_type, **kwargs):
@@ -131,19 +218,14 @@ def get_stable_or_newest_minecraft_version(version_type, **kwargs):
     # parameter stuff
     version_manifest_url = kwargs.get("custom_version_manifest_url", mojang_version_manifest_url)
 
-    response = requests.get(version_manifest_url)
-    data = response.json()
-    latest_data = data.get("latest", {})
-
-    latest_release = latest_data.get("release", None)
-    latest_snapshot = latest_data.get("snapshot", None)
+    manifest = get_version_manifest_index(version_manifest_url, **kwargs)
+    if manifest is None:
+        return None
 
-    if version_type == 'stable' or version_type == 'release':
-        return latest_release
-    elif version_type == 'snapshot' or version_type == 'newest':
-        return latest_snapshot
+    if version_type in ('stable', 'release', 'snapshot', 'newest'):
+        return manifest.get_latest(version_type)
     else:
-        return latest_data
+        return manifest.latest
 
 
 def find_main_class(client_version, **kwargs):
@@ -181,8 +263,16 @@ def create_version_data(minecraft_version, version_data, **kwargs):
 
         if version_data is None:
             return
-        else:
-            os.remove(version_data_file_path)
+
+        # Skip rewriting if the exist file is already the same as the (verified) version data
+        try:
+            with open(version_data_file_path, "r") as f:
+                if json.load(f) == version_data:
+                    return version_data_file_path
+        except ValueError:
+            pass
+
+        os.remove(version_data_file_path)
 
     with open(version_data_file_path, "w") as f:
         json.dump(version_data, f, indent=4)
@@ -190,7 +280,19 @@ def create_version_data(minecraft_version, version_data, **kwargs):
     return
 
 
-def get_version_data_from_exist_data(minecraft_version):
+def get_version_data_from_exist_data(minecraft_version, **kwargs):
+    """
+    Get exist version data (version store first, then ${version}.json at launcher_root/versions/). No request will
+    be sent, only the cached version_manifest_v2.json is used to find the version data sha1.
+    """
+    manifest = get_manifest_index(**{**kwargs, "cache_only": True})
+    if manifest is not None:
+        _, version_sha1 = manifest.get_url_and_sha1(minecraft_version)
+        if version_sha1 is not None:
+            version_data = load_version_data_from_store(version_sha1)
+            if version_data is not None:
+                return version_data
+
     versions_folder = os.path.join(Base.launcher_root_dir, "versions")
     version_data_file_path = os.path.join(versions_folder, f"{minecraft_version}.json")
 
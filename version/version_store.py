@@ -0,0 +1,128 @@
+"""
+libs/version/version_store.py
+
+Content-addressed version json store (version json files are saved by the sha1 which version_manifest_v2.json
+published, so a stored file can be served without sending any request)
+"""
+import hashlib
+import json
+import os
+import tempfile
+import requests
+from LauncherBase import Base
+from libs.Utils import network
+
+
+def get_version_store_folder():
+    return os.path.join(Base.launcher_root_dir, "cache", "versions")
+
+
+def get_version_store_path(sha1):
+    return os.path.join(get_version_store_folder(), sha1[:2], f"{sha1}.json")
+
+
+def load_version_data_from_store(sha1):
+    """
+    Load version data from the store (the file is verified against sha1 while reading)
+    :return: version data (not found or mismatch return None)
+    """
+    store_path = get_version_store_path(sha1)
+    if not os.path.exists(store_path):
+        return None
+
+    try:
+        with open(store_path, "rb") as f:
+            raw_data = f.read()
+    except OSError:
+        return None
+
+    if hashlib.sha1(raw_data).hexdigest() != sha1:
+        print(f"[DEBUG] Stored version data {store_path} checksum mismatch. Deleting...")
+        try:
+            os.remove(store_path)
+        except OSError:
+            pass
+        return None
+
+    try:
+        return json.loads(raw_data)
+    except ValueError:
+        return None
+
+
+def save_version_data_to_store(raw_data, sha1):
+    """
+    Save raw version json bytes to the store (raw_data must match sha1)
+    :return: Status
+    """
+    if hashlib.sha1(raw_data).hexdigest() != sha1:
+        return False
+
+    store_path = get_version_store_path(sha1)
+    store_dir = os.path.dirname(store_path)
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw_data)
+        os.replace(tmp_path, store_path)
+    except OSError as e:
+        print(f"[DEBUG] Unable to save version data to {store_path}. ERR:{e}")
+        return False
+
+    return True
+
+
+def remove_version_data_from_store(sha1):
+    """
+    Remove stored version data (used when the manifest publishes a new sha1 for the version)
+    :return: Status (not stored return False)
+    """
+    store_path = get_version_store_path(sha1)
+    if not os.path.exists(store_path):
+        return False
+
+    try:
+        os.remove(store_path)
+    except OSError:
+        return False
+
+    return True
+
+
+def fetch_version_data(version_url, sha1, **kwargs):
+    """
+    Get version data from the store, if it isn't stored, download it from version_url and save it to the store
+    :param version_url: Version json URL
+    :param sha1: Version json sha1 (from version_manifest_v2.json. If it is None, the store will not be used)
+    ***Other parameters***
+    :param session: requests.Session used to download the version json (default: the shared session)
+    :return: version data (failed return None)
+    """
+    # parameter stuff
+    session = kwargs.get("session", None)
+    if sha1 is not None:
+        version_data = load_version_data_from_store(sha1)
+        if version_data is not None:
+            return version_data
+
+    if not network.check_network_allowed(version_url):
+        return None
+
+    try:
+        if session is not None:
+            response = session.get(version_url, timeout=network.default_timeout)
+        else:
+            response = network.get(version_url)
+        response.raise_for_status()
+        raw_data = response.content
+        version_data = json.loads(raw_data)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"[DEBUG] Failed to get version data from {version_url}. ERR:{e}")
+        return None
+
+    # A mismatch usually means the cached manifest is outdated, so keep the data but don't store it
+    if sha1 is not None and not save_version_data_to_store(raw_data, sha1):
+        print(f"[DEBUG] Version data {version_url} checksum mismatch. Skip saving it to the store.")
+
+    return version_data